@@ -4,14 +4,26 @@ from .__version__ import __version__
 
 create = creator.create
 save = creator.save
+save_many = creator.save_many
+load_many = creator.load_many
 search = creator.search
+search_many = creator.search_many
+list_skills = creator.list_skills
+get_skill = creator.get_skill
+list_skill_versions = creator.list_skill_versions
 config = creator.config
 
 __all__ = [
     "cmd_client",
     "create",
     "save",
+    "save_many",
+    "load_many",
     "search",
+    "search_many",
+    "list_skills",
+    "get_skill",
+    "list_skill_versions",
     "config",
     "__version__"
 ]
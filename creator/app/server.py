@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from creator.agents.creator_agent import create_llm, create_creator_agent
 from creator.config.library import config
+from creator.core import creator
 from creator.__version__ import __version__ as version
 from pydantic import BaseModel
 
@@ -21,6 +22,8 @@ app = FastAPI(
 
 config.use_rich = False
 open_creator_agent = create_creator_agent(create_llm(config))
+if config.vectordb_watch:
+    creator.preload_vectordb()
 
 
 @app.post("/agents/creator")
@@ -106,6 +106,12 @@ arguments = [
                 "help_text": "Search query",
                 "type": str,
             },
+            {
+                "name": "query_file",
+                "nickname": "qf",
+                "help_text": "Path to a file with one search query per line",
+                "type": str,
+            },
             {
                 "name": "top_k",
                 "nickname": "k",
@@ -120,6 +126,31 @@ arguments = [
                 "type": float,
                 "default": 0.8
             },
+            {
+                "name": "mode",
+                "nickname": "m",
+                "help_text": "Search mode: vector, lexical (offline, no embedding call) or hybrid, default vector",
+                "type": str,
+                "default": "vector"
+            },
+            {
+                "name": "language",
+                "nickname": "l",
+                "help_text": "Only search skills written in this program language",
+                "type": str,
+            },
+            {
+                "name": "tags",
+                "nickname": "tg",
+                "help_text": "Only search skills with one of these comma separated tags",
+                "type": str,
+            },
+            {
+                "name": "author",
+                "nickname": "a",
+                "help_text": "Only search skills of this author",
+                "type": str,
+            },
             {
                 "name": "remote",
                 "nickname": "r",
@@ -245,17 +276,42 @@ def cmd_client():
         return
 
     if args.command == "search":
-        skills = creator.search(
-            query=args.query,
-            top_k=args.top_k,
-            threshold=args.threshold,
-            remote=args.remote,
-        )
-        rich_print("Searched {} skills:".format(len(skills)))
-        rich_print(Rule(style="white"))
-        for skill in skills:
-            skill.show()
+        filters = {
+            "language": args.language,
+            "tags": args.tags.split(",") if args.tags else None,
+            "author": args.author,
+        }
+        filters = {key: value for key, value in filters.items() if value}
+        if args.query_file:
+            with open(args.query_file, encoding="utf-8") as f:
+                queries = [line.strip() for line in f if line.strip()]
+            results = creator.search_many(
+                queries=queries,
+                top_k=args.top_k,
+                threshold=args.threshold,
+                remote=args.remote,
+                mode=args.mode,
+                filters=filters,
+            )
+        else:
+            queries = [args.query]
+            results = [creator.search(
+                query=args.query,
+                top_k=args.top_k,
+                threshold=args.threshold,
+                remote=args.remote,
+                mode=args.mode,
+                filters=filters,
+            )]
+        for query, skills in zip(queries, results):
+            if args.query_file:
+                rich_print("Searched {} skills for `{}`:".format(len(skills), query))
+            else:
+                rich_print("Searched {} skills:".format(len(skills)))
             rich_print(Rule(style="white"))
+            for skill in skills:
+                skill.show()
+                rich_print(Rule(style="white"))
         return
 
     if args.command == "server":
@@ -23,6 +23,8 @@ completer = NestedCompleter.from_nested_dict({
         '-q': None,
         '--top_k': None,
         '-k': None,
+        '--mode': {'vector': None, 'lexical': None, 'hybrid': None},
+        '-m': {'vector': None, 'lexical': None, 'hybrid': None},
     },
     '.test()': None,
     ".run": None,
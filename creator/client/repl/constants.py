@@ -33,6 +33,7 @@ help_commands = """
 - `%search`: Search for a skill
     - `-q` or `--query`: Search query
     - `-k` or `--top_k`: Number of results to return, default 3
+    - `-m` or `--mode`: vector, lexical (offline, no embedding call) or hybrid, default vector
 
 - `%exit`: Exit the CLI
 - `%clear`: clear current skill cache and printed messages
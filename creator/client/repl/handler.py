@@ -1,3 +1,5 @@
+import argparse
+import shlex
 import json
 
 from .constants import help_commands, prompt_prefix, prompt_message
@@ -5,6 +7,8 @@ from .style import style
 from .lexer import parse_line
 
 from creator.agents.creator_agent import open_creator_agent
+from creator.core import creator
+from creator.config.library import config
 from creator.utils import truncate_output, is_valid_code
 
 from langchain.output_parsers.json import parse_partial_json
@@ -14,12 +18,20 @@ from prompt_toolkit.shortcuts import print_formatted_text
 from prompt_toolkit.formatted_text import FormattedText
 
 
+class SearchArgumentParser(argparse.ArgumentParser):
+    """Argument parser that raises instead of printing usage and exiting the REPL."""
+    def error(self, message):
+        raise ValueError(message)
+
+
 class RequestHandler:
     """This is a class that will be used to handle the request from the REPL."""
     def __init__(self):
         self.messages = []
         self.message_states = [self.messages]
         self.history = []
+        if config.vectordb_watch:
+            creator.preload_vectordb()
 
     def handle(self, request, output_field):
         """
@@ -102,6 +114,37 @@ class RequestHandler:
             output = help_commands
             self.show_output(request, output_field, output, add_prompt_prefix=False, add_request=False, add_newline=False)
 
+        if request.startswith("%search"):
+            output = self.search_handler(request)
+            self.show_output(request, output_field, output, add_prompt_prefix=False, add_request=False, add_newline=False)
+
+    def search_handler(self, request):
+        """
+        Handle the `%search` meta-prompt command, `-m lexical` answers locally without any embedding call.
+
+        Args:
+            request (str): The user input string, e.g. `%search -q "extract pdf pages" -k 3 -m lexical`.
+
+        Returns:
+            str: The names and descriptions of the searched skills.
+        """
+        parser = SearchArgumentParser(prog="%search", add_help=False)
+        parser.add_argument("-q", "--query", type=str, default="")
+        parser.add_argument("-k", "--top_k", type=int, default=3)
+        parser.add_argument("-t", "--threshold", type=float, default=0.8)
+        parser.add_argument("-m", "--mode", type=str, default="vector", choices=["vector", "lexical", "hybrid"])
+        try:
+            args, rest = parser.parse_known_args(shlex.split(request)[1:])
+        except ValueError as e:
+            return f"<stderr>{e}\nUsage: %search -q QUERY [-k TOP_K] [-t THRESHOLD] [-m vector|lexical|hybrid]</stderr>"
+        query = args.query or " ".join(rest)
+        if not query:
+            return "<stderr>Please provide a search query with -q</stderr>"
+        skills = creator.search(query=query, top_k=args.top_k, threshold=args.threshold, mode=args.mode)
+        if len(skills) == 0:
+            return "<system>No skill found</system>"
+        return "\n".join(f"- {skill.skill_name}: {skill.skill_description}" for skill in skills)
+
     def expression_handler(self, request, output_field):
         """
         Handle user input that is recognized as a Python expression. The expression will
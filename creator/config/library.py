@@ -1,6 +1,7 @@
 from langchain.cache import SQLiteCache
 import langchain
 from pydantic import BaseModel
+from typing import Optional
 from creator.code_interpreter import CodeInterpreter
 from creator.config.load_config import load_yaml_config
 import os
@@ -26,6 +27,7 @@ _remote_skill_library_path = resolve_path(yaml_config.get("REMOTE_SKILL_LIBRARY_
 _local_skill_library_vectordb_path = resolve_path(yaml_config.get("LOCAL_SKILL_LIBRARY_VECTORD_PATH", ".cache/open_creator/vectordb/"))
 _prompt_cache_history_path = resolve_path(yaml_config.get("PROMPT_CACHE_HISTORY_PATH", ".cache/open_creator/prompt_cache/"))
 _logger_cache_path = resolve_path(yaml_config.get("LOGGER_CACHE_PATH", ".cache/open_creator/logs/"))
+_skill_object_store_path = resolve_path(yaml_config.get("SKILL_OBJECT_STORE_PATH", ".cache/open_creator/objects"))
 _skill_extract_agent_cache_path = resolve_path(yaml_config.get("SKILL_EXTRACT_AGENT_CACHE_PATH", ".cache/open_creator/llm_cache"))
 _official_skill_library_path = resolve_path(yaml_config.get("OFFICIAL_SKILL_LIBRARY_PATH", "timedomain/skill-library"))
 _official_skill_library_template_path = resolve_path(yaml_config.get("OFFICIAL_SKILL_LIBRARY_TEMPLATE_PATH", "timedomain/skill-library-template"))
@@ -33,6 +35,25 @@ _model = yaml_config.get("MODEL_NAME", "gpt-3.5-turbo-16k-0613")
 _temperature = yaml_config.get("TEMPERATURE", 0)
 _run_human_confirm = yaml_config.get("RUN_HUMAN_CONFIRM", False)
 _use_stream_callback = yaml_config.get("USE_STREAM_CALLBACK", True)
+_hub_index_repo_id = yaml_config.get("HUB_INDEX_REPO_ID", "timedomain/skill-library")
+_hub_mirror_path = os.path.expanduser(yaml_config.get("HUB_MIRROR_PATH", "") or "")
+_embedding_backend = yaml_config.get("EMBEDDING_BACKEND", "openai")
+_vectordb_ann_threshold = yaml_config.get("VECTORDB_ANN_THRESHOLD", 20000)
+_vectordb_ann_nprobe = yaml_config.get("VECTORDB_ANN_NPROBE", 8)
+_vectordb_watch = yaml_config.get("VECTORDB_WATCH", False)
+_vectordb_watch_debounce = yaml_config.get("VECTORDB_WATCH_DEBOUNCE", 1.0)
+_vectordb_watch_poll_interval = yaml_config.get("VECTORDB_WATCH_POLL_INTERVAL", 5.0)
+_vectordb_quantization = yaml_config.get("VECTORDB_QUANTIZATION", "none")
+_vectordb_rerank_factor = yaml_config.get("VECTORDB_RERANK_FACTOR", 4)
+_embedding_batch_size = yaml_config.get("EMBEDDING_BATCH_SIZE", 256)
+_embedding_max_workers = yaml_config.get("EMBEDDING_MAX_WORKERS", 4)
+_embedding_max_retries = yaml_config.get("EMBEDDING_MAX_RETRIES", 5)
+_embedding_requests_per_minute = yaml_config.get("EMBEDDING_REQUESTS_PER_MINUTE", 0)
+_embedding_cache_size = yaml_config.get("EMBEDDING_CACHE_SIZE", 100000)
+_query_cache_size = yaml_config.get("QUERY_CACHE_SIZE", 10000)
+_query_cache_ttl = yaml_config.get("QUERY_CACHE_TTL", 2592000)
+_skill_storage_format = yaml_config.get("SKILL_STORAGE_FORMAT", "files")
+_skill_cache_size = yaml_config.get("SKILL_CACHE_SIZE", 256)
 _build_in_skill_library_dir = yaml_config.get("BUILD_IN_SKILL_LIBRARY_DIR", "skill_library/open-creator/")
 _build_in_skill_library_dir = os.path.join(project_dir, _build_in_skill_library_dir)
 
@@ -65,6 +86,7 @@ class LibraryConfig(BaseModel):
     prompt_cache_history_path: str = _prompt_cache_history_path
     logger_cache_path: str = _logger_cache_path
     skill_extract_agent_cache_path: str = _skill_extract_agent_cache_path
+    skill_object_store_path: str = _skill_object_store_path
     model: str = _model
     temperature: float = _temperature
     official_skill_library_path: str = _official_skill_library_path
@@ -72,6 +94,25 @@ class LibraryConfig(BaseModel):
     build_in_skill_config: dict = build_in_skill_config
     run_human_confirm: bool = _run_human_confirm
     use_stream_callback: bool = _use_stream_callback
+    hub_index_repo_id: str = _hub_index_repo_id
+    hub_mirror_path: str = _hub_mirror_path
+    embedding_backend: str = _embedding_backend
+    vectordb_ann_threshold: int = _vectordb_ann_threshold
+    vectordb_ann_nprobe: int = _vectordb_ann_nprobe
+    vectordb_watch: bool = _vectordb_watch
+    vectordb_watch_debounce: float = _vectordb_watch_debounce
+    vectordb_watch_poll_interval: float = _vectordb_watch_poll_interval
+    vectordb_quantization: str = _vectordb_quantization
+    vectordb_rerank_factor: int = _vectordb_rerank_factor
+    embedding_batch_size: int = _embedding_batch_size
+    embedding_max_workers: int = _embedding_max_workers
+    embedding_max_retries: int = _embedding_max_retries
+    embedding_requests_per_minute: float = _embedding_requests_per_minute
+    embedding_cache_size: int = _embedding_cache_size
+    query_cache_size: int = _query_cache_size
+    query_cache_ttl: Optional[float] = _query_cache_ttl
+    skill_storage_format: str = _skill_storage_format
+    skill_cache_size: int = _skill_cache_size
     code_interpreter: CodeInterpreter = CodeInterpreter()
 
     # prompt paths
@@ -1,14 +1,21 @@
 import os
 from typing import Union, List, Optional
 from creator.agents import skill_extractor_agent, code_interpreter_agent
-from creator.core.skill import CodeSkill, BaseSkill, BaseSkillMetadata
+from creator.core.skill import CodeSkill, BaseSkill, BaseSkillMetadata, LazyCodeSkill
+from creator.core.object_store import get_skill_object_store
 from creator.config.library import config
-from creator.utils import print
+from creator.utils import print, PACK_FILE, SkillPack
 
 from creator.hub.huggingface import hf_pull
-from creator.retrivever.base import BaseVectorStore
+from creator.retrivever.sharded import ShardedVectorStore, default_roots
+from creator.retrivever.hub_index import load_hub_index
+from creator.retrivever.catalog import get_skill_catalog, sync_skill_catalog
+from creator.retrivever.manifest import read_skill
 
 import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 
 
@@ -65,7 +72,7 @@ def validate_save_params(func):
         kwargs = {**dict(zip(arg_names, args)), **kwargs}
         skill_key = ""
         for k, v in kwargs.items():
-            if type(v) is CodeSkill:
+            if isinstance(v, CodeSkill):
                 skill_key = k
         kwargs["skill"] = kwargs.pop(skill_key, None)
         skill = kwargs.get("skill", None)
@@ -86,12 +93,47 @@ def validate_save_params(func):
     return wrapper
 
 
+class SkillLoadCache:
+    """
+    Skills loaded from disk, by path, valid as long as the (inode, mtime, size) of their file do not change.
+    Callers get a `LazyCodeSkill.copy_of` the cached skill: lists, dicts and models are only copied once used,
+    and changing a loaded skill never changes the cached one.
+    The least recently used skills are evicted beyond `max_size` skills.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.skills = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path: str, load) -> CodeSkill:
+        stat = os.stat(path)
+        # saves replace the files, so the inode changes even when the mtime resolution is coarse
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            cached = self.skills.get(path)
+            if cached is not None and cached[0] == version:
+                self.skills.move_to_end(path)
+                return LazyCodeSkill.copy_of(cached[1])
+        skill = load(path)
+        if self.max_size > 0:
+            with self.lock:
+                self.skills[path] = (version, skill)
+                self.skills.move_to_end(path)
+                while len(self.skills) > self.max_size:
+                    self.skills.popitem(last=False)
+        return LazyCodeSkill.copy_of(skill)
+
+
 class Creator:
     """
     A class responsible for creating, saving and searching skills.
     Provides functionalities for generating skills from various sources.
     """
     vectordb = None
+    hub_vectordb = None
+    _vectordb_lock = threading.Lock()
+    _skill_cache = SkillLoadCache(config.skill_cache_size)
     config = config
 
     @classmethod
@@ -108,15 +150,46 @@ class Creator:
 
     @classmethod
     def _create_from_skill_json_path(cls, skill_json_path) -> CodeSkill:
-        """Load skill from a given path."""
+        """Load skill from a given path, loads of an unchanged file are served from memory."""
+        return cls._skill_cache.get(skill_json_path, cls._read_skill_json_path)
+
+    @classmethod
+    def _read_skill_json_path(cls, skill_json_path) -> CodeSkill:
         with open(skill_json_path, mode="r", encoding="utf-8") as f:
-            skill = CodeSkill.model_validate_json(f.read())
-            if not isinstance(skill.skill_metadata.created_at, str):
-                skill.skill_metadata.created_at = skill.skill_metadata.created_at.strftime("%Y-%m-%d %H:%M:%S")
-            if not isinstance(skill.skill_metadata.updated_at, str):
-                skill.skill_metadata.updated_at = skill.skill_metadata.updated_at.strftime("%Y-%m-%d %H:%M:%S")
+            skill_json = json.load(f)
+            if "conversation_history" in skill_json:
+                skill = CodeSkill.model_validate(skill_json)
+            else:
+                # the conversation history is stored next to skill.json, it is only read when used
+                skill = LazyCodeSkill.from_skill_json(skill_json, os.path.dirname(skill_json_path))
+        return cls._normalize_timestamps(skill)
+
+    @classmethod
+    def _create_from_skill_pack_path(cls, skill_pack_path) -> CodeSkill:
+        """Load skill from a packed skill file, loads of an unchanged file are served from memory."""
+        return cls._skill_cache.get(skill_pack_path, cls._read_skill_pack_path)
+
+    @classmethod
+    def _read_skill_pack_path(cls, skill_pack_path) -> CodeSkill:
+        skill_json = SkillPack(skill_pack_path).skill_json(fields=("skill_code", "test_summary"))
+        skill = LazyCodeSkill.from_skill_json(skill_json, os.path.dirname(skill_pack_path))
+        return cls._normalize_timestamps(skill)
+
+    @classmethod
+    def _normalize_timestamps(cls, skill) -> CodeSkill:
+        """Loaded skills keep created_at and updated_at as strings, the way they are saved."""
+        if not isinstance(skill.skill_metadata.created_at, str):
+            skill.skill_metadata.created_at = skill.skill_metadata.created_at.strftime("%Y-%m-%d %H:%M:%S")
+        if not isinstance(skill.skill_metadata.updated_at, str):
+            skill.skill_metadata.updated_at = skill.skill_metadata.updated_at.strftime("%Y-%m-%d %H:%M:%S")
         return skill
 
+    @classmethod
+    def _create_from_skill_dir(cls, skill_path) -> CodeSkill:
+        if os.path.exists(os.path.join(skill_path, PACK_FILE)):
+            return cls._create_from_skill_pack_path(os.path.join(skill_path, PACK_FILE))
+        return cls._create_from_skill_json_path(os.path.join(skill_path, "skill.json"))
+
     @classmethod
     @validate_create_params
     def create(
@@ -134,8 +207,7 @@ class Creator:
         """Main method to create a new skill."""
 
         if skill_path:
-            skill_json_path = os.path.join(skill_path, "skill.json")
-            return cls._create_from_skill_json_path(skill_json_path)
+            return cls._create_from_skill_dir(skill_path)
 
         if skill_json_path:
             return cls._create_from_skill_json_path(skill_json_path)
@@ -189,12 +261,124 @@ class Creator:
         skill.save(skill_path=skill_path, huggingface_repo_id=huggingface_repo_id)
 
     @classmethod
-    def search(self, query: str, top_k: int = 3, threshold=0.8, remote=False) -> List[Union[BaseSkill, CodeSkill]]:
+    def save_many(cls, skills: List[CodeSkill], skill_path: Optional[str] = None, max_workers: int = 8) -> List[str]:
+        """
+        Save many skills into `skill_path` (the local skill library by default), returns the path of every skill.
+        Skills are written in parallel, each file is replaced whole, the catalog is updated in one transaction
+        and a loaded vector database indexes all of them in one batch.
+        """
+        library_path = skill_path or config.local_skill_library_path
+        # a skill name saved twice keeps its last skill
+        skills_by_path = {os.path.abspath(os.path.join(library_path, skill.skill_name)): skill for skill in skills}
+
+        def write(path):
+            skills_by_path[path]._write(path)
+            return read_skill(path)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = dict(zip(skills_by_path, pool.map(write, skills_by_path)))
+        get_skill_catalog().upsert({path: skill_json for path, (skill_json, _) in results.items()})
+        # bump the parent dir mtimes so vector stores notice the change without rescanning
+        for parent in {os.path.dirname(path) for path in skills_by_path}:
+            os.utime(parent)
+        if cls.vectordb is not None:
+            cls.vectordb.refresh()
+        print(f"> saved {len(skills_by_path)} skills to {library_path}", print_type="markdown")
+        return list(skills_by_path)
+
+    @classmethod
+    def load_many(cls, skill_paths: List[str], max_workers: int = 8) -> List[Optional[CodeSkill]]:
+        """Load many skill directories in parallel, in the order of `skill_paths`, missing skills are None."""
+        def load(path):
+            if not os.path.exists(path):
+                print(f"[red]Warning:[/red] [yellow]The path {path} does not exist.[/yellow]")
+                return None
+            return cls._create_from_skill_dir(path)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(load, skill_paths))
+
+    @classmethod
+    def _load_hub_vectordb(cls):
+        if cls.hub_vectordb is None:
+            print(f"> loading the search index of {config.hub_index_repo_id}...", print_type="markdown")
+            cls.hub_vectordb = load_hub_index(config.hub_index_repo_id)
+        return cls.hub_vectordb
+
+    @classmethod
+    def _pull_hits(cls, hits: List[dict]) -> List[CodeSkill]:
+        # only the skills that matched are downloaded
+        return [cls.create(huggingface_repo_id=config.hub_index_repo_id, huggingface_skill_path=hit["huggingface_skill_path"]) for hit in hits]
+
+    @classmethod
+    def _load_vectordb(cls, verbose=True) -> ShardedVectorStore:
+        with cls._vectordb_lock:
+            if cls.vectordb is None:
+                if verbose:
+                    print("> loading vector database...", print_type="markdown")
+                cls.vectordb = ShardedVectorStore()
+                if config.vectordb_watch:
+                    cls.vectordb.start_watcher()
+        return cls.vectordb
+
+    @classmethod
+    def preload_vectordb(cls) -> None:
+        """Load and index the skill libraries in a background thread, so the first search does not pay for it."""
+        threading.Thread(target=cls._load_vectordb, kwargs={"verbose": False}, name="vectordb-preload", daemon=True).start()
+
+    @staticmethod
+    def _to_skills(skills: List[dict]) -> List[Union[BaseSkill, CodeSkill]]:
+        # code, conversation history and test summary are only read from disk when used
+        return [LazyCodeSkill.from_index(skill, skill["skill_id"]) if skill.get("skill_program_language", None) else BaseSkill(**skill) for skill in skills]
+
+    @classmethod
+    def list_skills(cls, filters: Optional[dict] = None) -> List[dict]:
+        """
+        List the skills of every library from the skill catalog, only libraries changed since the last call are walked.
+        Filters use the same keys as search filters, e.g. {"language": "python", "tags": ["pdf"]}.
+        """
+        return sync_skill_catalog(default_roots()).list(filters=filters)
+
+    @classmethod
+    def get_skill(cls, skill_name: str, version: Optional[str] = None, content_hash: Optional[str] = None) -> Optional[CodeSkill]:
+        """
+        Load a skill by name, the local library wins over remote and built-in skills.
+        With a `version` or a `content_hash` (see `list_skill_versions`), that version is loaded from the object store,
+        even when a later one was saved over it. Saves that kept the version number are told apart by their content hash.
+        """
+        if version is not None or content_hash is not None:
+            skill_json = get_skill_object_store().load(skill_name, version=version, content_hash=content_hash)
+            if skill_json is None:
+                print(f"[red]Warning:[/red] [yellow]Version {content_hash or version} of skill {skill_name} not found.[/yellow]")
+                return None
+            return CodeSkill.model_validate(skill_json)
+        skills = sync_skill_catalog(default_roots()).find(skill_name)
+        if len(skills) == 0:
+            print(f"[red]Warning:[/red] [yellow]Skill {skill_name} not found.[/yellow]")
+            return None
+        local = [skill for skill in skills if skill["path"].startswith(os.path.abspath(config.local_skill_library_path) + os.sep)]
+        return cls._create_from_skill_dir((local or skills)[0]["path"])
+
+    @classmethod
+    def list_skill_versions(cls, skill_name: str) -> List[dict]:
+        """The saved versions of a skill, oldest first, each with its version, content hash and metadata."""
+        return get_skill_object_store().versions(skill_name)
+
+    @classmethod
+    def search(self, query: str, top_k: int = 3, threshold=0.8, remote=False, mode="vector", filters: Optional[dict] = None) -> List[Union[BaseSkill, CodeSkill]]:
+        if remote:
+            hits = self._load_hub_vectordb().search(query, top_k=top_k, threshold=threshold, mode=mode, filters=filters)
+            return self._pull_hits(hits)
+        skills = self._load_vectordb().search(query, top_k=top_k, threshold=threshold, mode=mode, filters=filters)
+
+        return self._to_skills(skills)
+
+    @classmethod
+    def search_many(self, queries: List[str], top_k: int = 3, threshold=0.8, remote=False, mode="vector", filters: Optional[dict] = None) -> List[List[Union[BaseSkill, CodeSkill]]]:
+        """Search several queries at once, returns one list of skills per query."""
         if remote:
-            raise NotImplementedError
-        if self.vectordb is None:
-            print("> loading vector database...", print_type="markdown")
-            self.vectordb = BaseVectorStore()
-        skills = self.vectordb.search(query, top_k=top_k, threshold=threshold)
+            results = self._load_hub_vectordb().search_many(queries, top_k=top_k, threshold=threshold, mode=mode, filters=filters)
+            return [self._pull_hits(hits) for hits in results]
+        results = self._load_vectordb().search_many(queries, top_k=top_k, threshold=threshold, mode=mode, filters=filters)
 
-        return [CodeSkill(**skill) if skill.get("skill_program_language", None) else BaseSkill(**skill) for skill in skills]
+        return [self._to_skills(skills) for skills in results]
@@ -0,0 +1,103 @@
+import gzip
+import json
+import os
+import threading
+from typing import Optional
+
+from creator.config.library import config
+from creator.retrivever.locking import FileLock
+from creator.utils.content_hash import skill_content, skill_content_hash
+
+
+class SkillObjectStore:
+    """
+    Content addressed store of every saved version of every skill.
+
+    - objects/<hash[:2]>/<hash[2:]>.json.gz: the code and schema of a skill, keyed by their hash.
+      Objects never change once written, so identical skills saved from several libraries or hub repos are stored once.
+    - refs/<skill_name>.json: the versions of a skill, oldest first, each one the hash of its object
+      and the metadata the skill was saved with.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.join(path, "refs"), exist_ok=True)
+        # refs are read, updated and replaced by several processes
+        self.lock = FileLock(os.path.join(path, "refs.lock"))
+
+    def object_path(self, content_hash: str) -> str:
+        return os.path.join(self.path, "objects", content_hash[:2], content_hash[2:] + ".json.gz")
+
+    def ref_path(self, skill_name: str) -> str:
+        return os.path.join(self.path, "refs", skill_name + ".json")
+
+    def put(self, skill_json: dict) -> str:
+        """Store the code and schema of a skill json, returns their hash."""
+        content_hash = skill_content_hash(skill_json)
+        path = self.object_path(content_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = json.dumps(skill_content(skill_json), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            # several writers may store the same object at once, each one through its own temporary file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(gzip.compress(data, mtime=0))
+            os.replace(tmp_path, path)
+        return content_hash
+
+    def get(self, content_hash: str) -> dict:
+        with open(self.object_path(content_hash), "rb") as f:
+            return json.loads(gzip.decompress(f.read()))
+
+    def versions(self, skill_name: str) -> list:
+        """The saved versions of a skill, oldest first, as dicts of version, hash and skill_metadata."""
+        if not os.path.exists(self.ref_path(skill_name)):
+            return []
+        with open(self.ref_path(skill_name), encoding="utf-8") as f:
+            return json.load(f)["versions"]
+
+    def record(self, skill_json: dict) -> str:
+        """Store a skill json and add it to the versions of the skill, returns the hash of its content."""
+        content_hash = self.put(skill_json)
+        metadata = skill_json.get("skill_metadata") or {}
+        version = metadata.get("version")
+        with self.lock:
+            versions = self.versions(skill_json["skill_name"])
+            if len(versions) > 0 and versions[-1]["version"] == version and versions[-1]["hash"] == content_hash:
+                # saved again unchanged, only its metadata moved on (updated_at, usage_count, ...)
+                versions[-1]["skill_metadata"] = metadata
+            else:
+                versions.append({"version": version, "hash": content_hash, "skill_metadata": metadata})
+            ref_path = self.ref_path(skill_json["skill_name"])
+            tmp_path = ref_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"versions": versions}, f, ensure_ascii=False)
+            os.replace(tmp_path, ref_path)
+        return content_hash
+
+    def load(self, skill_name: str, version: Optional[str] = None, content_hash: Optional[str] = None) -> Optional[dict]:
+        """
+        The skill json of a saved version of the skill, None if it was never saved.
+        Versions are selected by `version` and/or `content_hash`, the last matching one wins, as the same version
+        number is usually saved several times with different code.
+        """
+        versions = [
+            entry for entry in self.versions(skill_name)
+            if (version is None or entry["version"] == version) and (content_hash is None or entry["hash"] == content_hash)
+        ]
+        if len(versions) == 0:
+            return None
+        return {**self.get(versions[-1]["hash"]), "skill_metadata": versions[-1]["skill_metadata"]}
+
+
+_object_store = None
+_object_store_lock = threading.Lock()
+
+
+def get_skill_object_store() -> SkillObjectStore:
+    """The object store shared by the whole process, in `config.skill_object_store_path`."""
+    global _object_store
+    with _object_store_lock:
+        if _object_store is None:
+            _object_store = SkillObjectStore(config.skill_object_store_path)
+        return _object_store
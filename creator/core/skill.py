@@ -1,16 +1,25 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import List, Dict, Optional, Union, Any
 from datetime import datetime
 from creator.utils import remove_title
 from creator.config.library import config
 from creator.utils import generate_skill_doc, generate_install_command, print, generate_language_suffix
+from creator.utils import PACK_FILE, SkillPack, write_skill_pack, explode_skill_pack
+from creator.utils.skill_pack import OUT_OF_LINE_FIELDS, HISTORY_FILE, dump_conversation_history, load_conversation_history
 from creator.agents import code_interpreter_agent, code_tester_agent, code_refactor_agent
 from creator.hub.huggingface import hf_repo_update, hf_push
+from creator.retrivever.catalog import get_skill_catalog
+from .object_store import get_skill_object_store
+import copy
 import json
 import getpass
 import os
 
 
+# files of the legacy layout written by `CodeSkill.save`, besides skill_code.<suffix>
+SKILL_FILE_NAMES = ("skill.json", "function_call.json", "install_dependencies.sh", "conversation_history.json", HISTORY_FILE, "skill_doc.md", "embedding_text.txt", "test_summary.json")
+
+
 class BaseSkillMetadata(BaseModel):
     created_at: Union[datetime, str] = Field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"), description="Creation timestamp")
     author: str = Field(default_factory=lambda:getpass.getuser(), description="Author of the skill")
@@ -211,7 +220,8 @@ When writing code, it's imperative to follow industry standards and best practic
         return
 
     def __add__(self, other_skill):
-        assert isinstance(other_skill, type(self)), f"Cannot combine {type(self)} with {type(other_skill)}"
+        # skills loaded from disk are `LazyCodeSkill`s, they combine with any other code skill
+        assert isinstance(other_skill, CodeSkill), f"Cannot combine {type(self)} with {type(other_skill)}"
         self.Config.refactorable = True
         # If the list is empty, add the current object to it
         if not self.Config.skills_to_combine:
@@ -390,6 +400,54 @@ runner = unittest.TextTestRunner(stream=stream)
         code = f"""```{self.skill_program_language}\n{self.skill_code}\n```"""
         print(code, print_type="markdown")
 
+    def _skill_files(self, packed=False) -> dict:
+        """Content of every file of the saved skill, by file name."""
+        # packs are read by programs, not people, and keep the heavy fields out of skill.json
+        indent = None if packed else 4
+        skill_json = self.model_dump(exclude={"conversation_history"})
+        if packed:
+            for field in OUT_OF_LINE_FIELDS:
+                skill_json.pop(field, None)
+        # save json file
+        files = {"skill.json": json.dumps(skill_json, ensure_ascii=False, indent=indent)}
+        # save function call
+        files["function_call.json"] = json.dumps(self.to_function_call(), ensure_ascii=False, indent=indent)
+        # save dependencies
+        if self.skill_dependencies:
+            files["install_dependencies.sh"] = generate_install_command(self.skill_program_language, self.skill_dependencies)
+        # save code
+        if self.skill_program_language:
+            files["skill_code" + generate_language_suffix(self.skill_program_language)] = self.skill_code
+        # save conversation history, only once and compressed, it is usually the largest part of a skill
+        if self.conversation_history:
+            files[HISTORY_FILE] = dump_conversation_history(self.conversation_history)
+        # skill description
+        files["skill_doc.md"] = generate_skill_doc(self)
+        # embedding_text
+        files["embedding_text.txt"] = "{skill.skill_name}\n{skill.skill_description}\n{skill.skill_usage_example}\n{skill.skill_tags}".format(skill=self)
+        # save test code
+        if self.test_summary:
+            files["test_summary.json"] = json.dumps(self.test_summary.model_dump(), ensure_ascii=False, indent=indent)
+        return files
+
+    def _write(self, skill_path) -> bool:
+        """Write the files of the skill into `skill_path` and record its version, returns whether it was packed."""
+        os.makedirs(skill_path, exist_ok=True)
+        packed = config.skill_storage_format == "packed"
+        files = self._skill_files(packed=packed)
+        if packed:
+            write_skill_pack(os.path.join(skill_path, PACK_FILE), files)
+        else:
+            # every file is replaced whole, and skill.json goes last:
+            # a directory is only indexed as a skill once its skill.json exists
+            for name in sorted(files, key=lambda name: name == "skill.json"):
+                _write_file(os.path.join(skill_path, name), files[name])
+        # files of the other format are stale copies, they must not be loaded or indexed instead
+        _remove_stale_files(skill_path, files, packed)
+        # the skill directory only holds the last save, every version is kept in the object store
+        get_skill_object_store().record(self.model_dump(mode="json", exclude={"conversation_history", "test_summary"}))
+        return packed
+
     def save(self, skill_path=None, huggingface_repo_id=None):
         if skill_path is None:
             skill_path = os.path.join(config.local_skill_library_path, self.skill_name)
@@ -404,51 +462,141 @@ runner = unittest.TextTestRunner(stream=stream)
             skill_path = os.path.join(config.local_skill_library_path, self.skill_name)
 
         if skill_path:
-            os.makedirs(os.path.dirname(skill_path), exist_ok=True)
-            # save json file
-            with open(os.path.join(skill_path, "skill.json"), mode="w", encoding="utf-8") as f:
-                json.dump(self.model_dump(), f, ensure_ascii=False, indent=4)
-
-            # save function call
-            with open(os.path.join(skill_path, "function_call.json"), mode="w", encoding="utf-8") as f:
-                json.dump(self.to_function_call(), f, ensure_ascii=False, indent=4)
-
-            # save dependencies
-            command_str = ""
-            if self.skill_dependencies:
-                command_str = generate_install_command(self.skill_program_language, self.skill_dependencies)
-                with open(os.path.join(skill_path, "install_dependencies.sh"), mode="w", encoding="utf-8") as f:
-                    f.write(command_str)
-
-            # save code
-            if self.skill_program_language:
-                language_suffix = generate_language_suffix(self.skill_program_language)
-                with open(os.path.join(skill_path, "skill_code" + language_suffix), mode="w", encoding="utf-8") as f:
-                    f.write(self.skill_code)
-
-            # save conversation history
-            if self.conversation_history:
-                with open(os.path.join(skill_path, "conversation_history.json"), mode="w", encoding="utf-8") as f:
-                    f.write(json.dumps(self.conversation_history, ensure_ascii=False, indent=4))
-
-            # skill description
-            doc = generate_skill_doc(self)
-            with open(os.path.join(skill_path, "skill_doc.md"), mode="w", encoding="utf-8") as f:
-                f.write(doc)
-
-            # embedding_text
-            embedding_text = "{skill.skill_name}\n{skill.skill_description}\n{skill.skill_usage_example}\n{skill.skill_tags}".format(skill=self)
-            with open(os.path.join(skill_path, "embedding_text.txt"), mode="w", encoding="utf-8") as f:
-                f.write(embedding_text)
-
-            # save test code
-            if self.test_summary:
-                with open(os.path.join(skill_path, "test_summary.json"), mode="w", encoding="utf-8") as f:
-                    json.dump(self.test_summary.model_dump(), f, ensure_ascii=False, indent=4)
+            packed = self._write(skill_path)
+
+            # listing and lookups by name read the catalog, it is updated in one transaction
+            get_skill_catalog().record(skill_path)
+
+            # bump the parent dir mtime so vector stores notice the change without rescanning
+            os.utime(os.path.dirname(os.path.abspath(skill_path)))
 
             if huggingface_repo_id:
-                # cp to local path
-                os.system(command=f"cp -r {skill_path} {remote_skill_path}")
+                if packed:
+                    explode_skill_pack(skill_path, remote_skill_path)
+                else:
+                    # cp to local path
+                    os.system(command=f"cp -r {skill_path} {remote_skill_path}")
+                # hub repos keep the legacy layout, the conversation history inside skill.json, as hf_pull only fetches skill.json
+                _write_file(os.path.join(remote_skill_path, "skill.json"), json.dumps(self.model_dump(), ensure_ascii=False, indent=4))
+                if os.path.exists(os.path.join(remote_skill_path, HISTORY_FILE)):
+                    os.remove(os.path.join(remote_skill_path, HISTORY_FILE))
                 hf_push(remote_skill_path)
 
         print(f"> saved to {skill_path}", print_type="markdown")
+
+
+def _write_file(path: str, content) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, mode="wb") as f:
+        f.write(content if isinstance(content, bytes) else content.encode("utf-8"))
+    os.replace(tmp_path, path)
+
+
+def _remove_stale_files(skill_path: str, files: dict, packed: bool) -> None:
+    # e.g. a conversation history or dependencies the skill no longer has, or the code of its previous language
+    written = {PACK_FILE} if packed else set(files)
+    for name in os.listdir(skill_path):
+        if name not in written and (name == PACK_FILE or name in SKILL_FILE_NAMES or name.startswith("skill_code.")):
+            os.remove(os.path.join(skill_path, name))
+
+
+# fields left out of the search index, loaded from the skill directory when first used
+LAZY_FIELDS = ("skill_code", "conversation_history", "test_summary")
+LAZY_FIELD_DEFAULTS = {"skill_code": "", "conversation_history": [], "test_summary": None}
+# field values copies of a cached skill share with it
+IMMUTABLE_TYPES = (str, int, float, bool, type(None))
+
+
+class LazyCodeSkill(CodeSkill):
+    """
+    `CodeSkill` returned by search, built from the slim index metadata of the skill.
+    `skill_code`, `conversation_history` and `test_summary` are read from the skill directory on first access,
+    packed skills only read the entry of the field accessed.
+    Skills loaded from disk are lazy too, their conversation history is only read when `test` or `refactor` use it.
+    """
+
+    _skill_path: str = PrivateAttr("")
+    # skill the missing fields are copied from when first used, see `copy_of`
+    _source: Optional[CodeSkill] = PrivateAttr(None)
+
+    @classmethod
+    def from_index(cls, metadata: dict, skill_path: str) -> "LazyCodeSkill":
+        skill = cls(**{**metadata, "skill_code": ""})
+        skill._skill_path = skill_path
+        for field in LAZY_FIELDS:
+            skill.__dict__.pop(field, None)
+        return skill
+
+    @classmethod
+    def from_skill_json(cls, skill_json: dict, skill_path: str) -> "LazyCodeSkill":
+        """The skill of `skill_json`, fields missing from it are read from `skill_path` when first used."""
+        skill = cls.model_validate(skill_json)
+        skill._skill_path = skill_path
+        for field in LAZY_FIELDS:
+            if field not in skill_json:
+                skill.__dict__.pop(field, None)
+        return skill
+
+    @classmethod
+    def copy_of(cls, skill: CodeSkill) -> "LazyCodeSkill":
+        """
+        A copy of `skill` that shares its immutable values and deep copies a mutable one (list, dict, model)
+        only when it is first used, so changing the copy never changes `skill`. `skill` must not change afterwards.
+        """
+        shared = {field: value for field, value in skill.__dict__.items() if isinstance(value, IMMUTABLE_TYPES)}
+        copy = cls.model_construct(_fields_set=set(skill.model_fields_set), **shared)
+        for field in cls.__pydantic_fields__:
+            if field not in shared:
+                copy.__dict__.pop(field, None)
+        copy._skill_path = getattr(skill, "_skill_path", "")
+        copy._source = skill
+        return copy
+
+    def __getattr__(self, name):
+        if name in type(self).__pydantic_fields__:
+            self._load_lazy_fields((name,))
+            return self.__dict__[name]
+        return super().__getattr__(name)
+
+    def _load_lazy_fields(self, fields=None) -> None:
+        fields = [field for field in (fields or type(self).__pydantic_fields__) if field not in self.__dict__]
+        source = self._source
+        if source is not None:
+            if isinstance(source, LazyCodeSkill):
+                # read from disk once, into the cached skill, for every copy of it
+                source._load_lazy_fields(fields)
+            for field in [field for field in fields if field in source.__dict__]:
+                self.__dict__[field] = copy.deepcopy(source.__dict__[field])
+            # fields the source did not load yet either
+            fields = [field for field in fields if field not in self.__dict__]
+        if len(fields) == 0:
+            return
+        pack_path = os.path.join(self._skill_path, PACK_FILE)
+        history_path = os.path.join(self._skill_path, HISTORY_FILE)
+        if os.path.exists(pack_path):
+            pack = SkillPack(pack_path)
+            values = {field: pack.read_field(field) for field in fields}
+        elif fields == ["conversation_history"] and os.path.exists(history_path):
+            with open(history_path, mode="rb") as f:
+                values = {"conversation_history": load_conversation_history(f.read())}
+        else:
+            with open(os.path.join(self._skill_path, "skill.json"), encoding="utf-8") as f:
+                values = json.load(f)
+            if os.path.exists(history_path):
+                with open(history_path, mode="rb") as f:
+                    values["conversation_history"] = load_conversation_history(f.read())
+            # the whole file is parsed anyway
+            values = {field: values.get(field) for field in LAZY_FIELDS}
+        for field, value in values.items():
+            if field == "test_summary" and value:
+                value = TestSummary(**value)
+            # fields assigned since the search keep their new value
+            self.__dict__.setdefault(field, value if value is not None else copy.deepcopy(LAZY_FIELD_DEFAULTS[field]))
+
+    def model_dump(self, **kwargs):
+        self._load_lazy_fields()
+        return super().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs):
+        self._load_lazy_fields()
+        return super().model_dump_json(**kwargs)
@@ -1,23 +1,67 @@
 import json
 from creator.config.library import config
 from huggingface_hub import hf_hub_download, duplicate_space, Repository
+from huggingface_hub.utils import EntryNotFoundError
+from creator.utils.skill_pack import HISTORY_FILE, load_conversation_history
 import os
 from loguru import logger
 import subprocess
+import filecmp
+import shutil
+
+
+def hf_download(repo_id, filename, subfolder=None) -> str:
+    """Download a file of a hub space, read from HUB_MIRROR_PATH instead when it is set (a directory laid out as <repo_id>/<file path>)."""
+    if config.hub_mirror_path:
+        return_path = os.path.join(config.hub_mirror_path, repo_id, subfolder or "", filename)
+        if not os.path.exists(return_path):
+            raise FileNotFoundError(f"{filename} not found in the mirror of {repo_id} at {return_path}")
+        return return_path
+    return hf_hub_download(repo_id=repo_id, subfolder=subfolder, filename=filename, repo_type="space")
 
 
 def hf_pull(repo_id, huggingface_skill_path, save_path) -> dict:
-    return_path = hf_hub_download(repo_id=repo_id, subfolder=huggingface_skill_path, filename="skill.json", repo_type="space")
+    return_path = hf_download(repo_id=repo_id, subfolder=huggingface_skill_path, filename="skill.json")
     with open(return_path, encoding="utf-8") as f:
         skill_json = json.load(f)
     # copy to local skill library
     if not os.path.exists(save_path):
         os.makedirs(save_path)
     os.system(command=f"cp {return_path} {save_path}")
+    if "conversation_history" not in skill_json:
+        # skills pushed with their conversation history next to skill.json
+        try:
+            history_path = hf_download(repo_id=repo_id, subfolder=huggingface_skill_path, filename=HISTORY_FILE)
+        except (FileNotFoundError, EntryNotFoundError):
+            history_path = None
+        if history_path is not None:
+            with open(history_path, mode="rb") as f:
+                skill_json["conversation_history"] = load_conversation_history(f.read())
     logger.success(f"Successfully pulled skill {huggingface_skill_path} from repo {repo_id} to {save_path}.")
     return skill_json
 
 
+def hf_pull_index(repo_id, save_path, index_dir="index") -> bool:
+    """
+    Mirror the precomputed search index of a hub repo (`vector_db.json` and its matrix file) into save_path.
+    Returns True when a new index was copied, False when save_path already holds the same one.
+    """
+    metadata_path = hf_download(repo_id=repo_id, subfolder=index_dir, filename="vector_db.json")
+    local_metadata_path = os.path.join(save_path, "vector_db.json")
+    if os.path.exists(local_metadata_path) and filecmp.cmp(metadata_path, local_metadata_path, shallow=False):
+        return False
+    with open(metadata_path, encoding="utf-8") as f:
+        matrix_file = json.load(f)["matrix_file"]
+    matrix_path = hf_download(repo_id=repo_id, subfolder=index_dir, filename=matrix_file)
+    # files derived from the previous index (lexical index, ann, ...) are rebuilt from scratch
+    shutil.rmtree(save_path, ignore_errors=True)
+    os.makedirs(save_path)
+    shutil.copy(matrix_path, os.path.join(save_path, matrix_file))
+    shutil.copy(metadata_path, local_metadata_path)
+    logger.success(f"Successfully pulled the search index of repo {repo_id} to {save_path}.")
+    return True
+
+
 def hf_repo_update(repo_id, local_dir):
     if not os.path.exists(local_dir):
         os.makedirs(local_dir)
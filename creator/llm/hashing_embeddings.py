@@ -0,0 +1,58 @@
+import numpy as np
+from typing import List
+import hashlib
+import re
+
+from langchain.embeddings.base import Embeddings
+
+
+# ascii words, and every non-ascii character on its own so CJK text still gets features
+WORD_PATTERN = re.compile(r"[A-Za-z0-9]+|[^\x00-\x7F]")
+SUBWORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Local embedding model based on feature hashing, no network and no model files needed.
+
+    Words (identifiers are also split into their snake_case/camelCase parts), word bigrams and
+    character trigrams are hashed into `dimension` signed buckets with sublinear term frequency,
+    then the vector is L2-normalized. The vectors are stateless: the same text always gets the same
+    vector, so skills can be indexed incrementally and searched fully offline.
+    """
+
+    def __init__(self, dimension: int = 1024):
+        self.dimension = dimension
+        self.model = f"hashing-{dimension}"
+
+    def _features(self, text: str) -> List[str]:
+        words = []
+        for word in WORD_PATTERN.findall(text):
+            parts = [part.lower() for part in SUBWORD_PATTERN.findall(word)]
+            words.extend(parts if len(parts) > 0 else [word.lower()])
+        features = ["w:" + word for word in words]
+        features.extend("b:" + first + " " + second for first, second in zip(words, words[1:]))
+        for word in words:
+            padded = f"<{word}>"
+            features.extend("c:" + padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        counts = {}
+        for feature in self._features(text):
+            counts[feature] = counts.get(feature, 0) + 1
+        for feature, count in counts.items():
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            sign = 1.0 if digest >> 63 else -1.0
+            vector[digest % self.dimension] += sign * (1.0 + np.log(count))
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
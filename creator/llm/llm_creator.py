@@ -3,8 +3,11 @@ from creator.callbacks import OutputBufferStreamingHandler, RichTerminalStreamin
 from langchain.callbacks.manager import CallbackManager
 from langchain.embeddings import OpenAIEmbeddings
 from .chatopenai_with_trim import ChatOpenAIWithTrim, AzureChatOpenAIWithTrim
+from .hashing_embeddings import HashingEmbeddings
 
 
+EMBEDDING_BACKENDS = ("openai", "hashing")
+
 def create_llm(config):
     use_azure = True if os.getenv("OPENAI_API_TYPE", None) == "azure" else False
 
@@ -33,7 +36,13 @@ def create_llm(config):
     return llm
 
 
-def create_embedding(**kwargs):
+def create_embedding(backend="openai", **kwargs):
+
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"embedding backend should be one of {EMBEDDING_BACKENDS}, got {backend!r}")
+
+    if backend == "hashing":
+        return HashingEmbeddings(**kwargs)
 
     use_azure = True if os.getenv("OPENAI_API_TYPE", None) == "azure" else False
 
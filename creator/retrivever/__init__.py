@@ -1,4 +1,6 @@
 from .base import BaseVectorStore
+from .sharded import ShardedVectorStore
+from .hub_index import build_hub_index, load_hub_index
 
 
-__all__ = ["BaseVectorStore"]
+__all__ = ["BaseVectorStore", "ShardedVectorStore", "build_hub_index", "load_hub_index"]
@@ -0,0 +1,114 @@
+import numpy as np
+import os
+
+from .score_functions import normalize, top_k_indices
+
+
+class IVFIndex:
+    """
+    Inverted file index over the unit-normalized rows of an `EmbeddingStore`.
+
+    A spherical k-means coarse quantizer splits the rows into `nlist` lists, a query only scores
+    the rows of its `nprobe` closest lists. Raising `nprobe` trades latency for recall,
+    `nprobe == nlist` is exact brute force. Persisted as `ivf_index.npz` next to `vector_db.json`.
+    """
+
+    train_iterations = 10
+    # rows sampled per list when training the quantizer
+    train_sample_per_list = 64
+    assign_batch_size = 65536
+
+    def __init__(self, vectordb_path: str, nprobe: int = 8, name: str = "ivf_index"):
+        self.path = os.path.join(vectordb_path, name + ".npz")
+        self.nprobe = nprobe
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.store_generation = -1
+        self.trained_rows = 0
+        self.lists = []
+        if os.path.exists(self.path):
+            data = np.load(self.path)
+            self.centroids = data["centroids"]
+            self.assignments = data["assignments"]
+            self.store_generation = int(data["store_generation"])
+            self.trained_rows = int(data["trained_rows"])
+            self._build_lists()
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, matrix, live) -> None:
+        rows = np.flatnonzero(live)
+        nlist = max(1, int(np.sqrt(len(rows))))
+        rng = np.random.default_rng(0)
+        sample = rows[rng.permutation(len(rows))[:nlist * self.train_sample_per_list]]
+        sample_vectors = np.asarray(matrix[np.sort(sample)], dtype=np.float32)
+        centroids = sample_vectors[rng.choice(len(sample_vectors), size=nlist, replace=False)]
+        for _ in range(self.train_iterations):
+            labels = np.argmax(sample_vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample_vectors)
+            # empty lists keep their previous centroid
+            empty = np.bincount(labels, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize(sums)
+        self.centroids = centroids
+        self.assignments = np.full(len(matrix), -1, dtype=np.int32)
+        self.trained_rows = len(rows)
+        self.assign(matrix, rows)
+
+    def assign(self, matrix, rows) -> None:
+        """Put `rows` in the list of their nearest centroid, new rows grow the assignment table."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(self.assignments) < len(matrix):
+            self.assignments = np.concatenate([self.assignments, np.full(len(matrix) - len(self.assignments), -1, dtype=np.int32)])
+        for start in range(0, len(rows), self.assign_batch_size):
+            batch = rows[start:start + self.assign_batch_size]
+            self.assignments[batch] = np.argmax(np.asarray(matrix[batch]) @ self.centroids.T, axis=1)
+        self._build_lists()
+
+    def sync(self, store, changed_rows=()) -> None:
+        """Bring the index up to date with the store, retraining when rows were renumbered or the library doubled."""
+        live_rows = int(store.live.sum())
+        if not self.is_trained or self.store_generation != store.generation or live_rows > 2 * self.trained_rows:
+            self.train(store.matrix, store.live)
+        else:
+            rows = set(changed_rows) | set(range(len(self.assignments), store.rows))
+            if len(rows) == 0:
+                return
+            self.assign(store.matrix, sorted(rows))
+        self.store_generation = store.generation
+        self.save()
+
+    def _build_lists(self) -> None:
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def candidates(self, query_vec, mask=None, nprobe=None):
+        """Sorted rows of the closest `nprobe` lists to `query_vec`, only those where `mask` is True."""
+        probe = top_k_indices(self.centroids @ normalize(query_vec), k=nprobe or self.nprobe)
+        candidates = np.sort(np.concatenate([self.lists[i] for i in probe]))
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        return candidates
+
+    def search(self, docs_matrix, query_vec, k=3, threshold=None, mask=None, nprobe=None):
+        """Same contract as `cosine_similarity`, but only rows of the closest `nprobe` lists are scored."""
+        query_vec = normalize(query_vec)
+        candidates = self.candidates(query_vec, mask=mask, nprobe=nprobe)
+        similarities = np.asarray(docs_matrix[candidates]) @ query_vec
+        top_k = top_k_indices(similarities, k=k, threshold=threshold)
+        return candidates[top_k], similarities[top_k]
+
+    def save(self) -> None:
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            assignments=self.assignments,
+            store_generation=self.store_generation,
+            trained_rows=self.trained_rows,
+        )
+        os.replace(tmp_path, self.path)
@@ -1,106 +1,396 @@
 import numpy as np
-from typing import List
-import json
+from typing import List, Optional
 import os
+import threading
+from loguru import logger
 
 from creator.llm import create_embedding
 from creator.config.library import config
 
-from .score_functions import cosine_similarity
+from .score_functions import cosine_similarity_many
+from .storage import EmbeddingStore
+from .manifest import SkillManifest, read_skill, text_hash, HEAVY_FIELDS
+from .ann import IVFIndex
+from .cache import EmbeddingCache, embedding_model_name, embedding_dimension
+from .lexical import BM25Index
+from .filters import MetadataIndex, matches
+from .quantization import QuantizedMatrix
+from .pipeline import EmbeddingPipeline
+from .catalog import get_skill_catalog
+from .locking import FileLock
+
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+# embedding model class of the indexes that did not record their model
+LEGACY_EMBEDDING_BACKEND = "OpenAIEmbeddings"
+# reciprocal rank fusion constant, dampens the weight of the very first ranks
+RRF_K = 60
 
 
 class BaseVectorStore:
+    # compact the matrix once dead rows outnumber this fraction of all rows
+    compact_dead_ratio = 0.5
+    # hybrid search fuses this many times top_k candidates from each ranking
+    hybrid_candidates = 4
 
-    def __init__(self, skill_library_path: str = ""):
+    def __init__(self, skill_library_path: str = "", vectordb_path: str = "", embedding_model=None, embedding_cache=None, query_cache=None, static: bool = False):
+        """
+        The embedding model and caches can be passed in to share them between several stores.
+        A static store searches the index files found in `vectordb_path` as they are and never scans a skill library.
+        """
 
-        self.vectordb_path: str = config.local_skill_library_vectordb_path
+        self.vectordb_path: str = vectordb_path or config.local_skill_library_vectordb_path
+        self.static = static
+        # False while a background watcher keeps the index up to date
+        self.auto_refresh = True
+        # held while the index is swapped, searches never see a half applied update
+        self.lock = threading.RLock()
         self.skill_library_path = config.local_skill_library_path
-        self.vector_store = {}
-        self.embeddings = None
-        self.embedding_model = create_embedding()
-        self.sorted_keys = []
-        self.query_cache = {}
+        self.embedding_model = embedding_model or create_embedding(backend=config.embedding_backend)
+        # shared by every library root, so a skill copied between libraries is never embedded twice
+        self.embedding_cache = embedding_cache or create_embedding_cache()
+        self.embedding_pipeline = create_embedding_pipeline()
 
         if skill_library_path and os.path.exists(skill_library_path):
             self.skill_library_path = skill_library_path
 
-        if os.path.isdir(self.skill_library_path):
-            self.query_cache_path = self.vectordb_path + "/query_cache.json"
-            self.vectordb_path = self.vectordb_path + "/vector_db.json"
-            if os.path.exists(self.query_cache_path):
-                with open(self.query_cache_path, mode="r", encoding="utf-8") as f:
-                    self.query_cache = json.load(f)
-
-        if os.path.exists(self.vectordb_path):
-            # load vectordb
-            with open(self.vectordb_path, mode="r", encoding="utf-8") as f:
-                self.vector_store = json.load(f)
-        
-        self.update_index()
-
-    def update_index(self):
-        # glob skill_library_path to find `embedding_text.txt`
-        embeddings = []
+        os.makedirs(self.vectordb_path, exist_ok=True)
+        # query embeddings by normalized query text, ranking is always recomputed against the current index
+        self.query_cache = query_cache or create_query_cache(self.vectordb_path)
+
+        # static indexes are not skill libraries on disk, they stay out of the catalog
+        self.catalog = None if static else get_skill_catalog()
+        self.metadata_index = MetadataIndex()
+        # single writer, many readers: updates of the index files are serialized across processes,
+        # searches never take this lock and keep reading the files they loaded
+        self.write_lock = FileLock(os.path.join(self.vectordb_path, "vector_db.lock"))
+        with self.write_lock:
+            self._load()
+            # skills that cannot be embedded now (e.g. offline) should not prevent lexical searches
+            self.update_index(defer_embedding=True)
+            indexed = {os.path.abspath(key) for key in (*self.vector_store, *self.pending)}
+            if self.catalog is not None and set(self.catalog.paths(self.skill_library_path)) != indexed:
+                # the catalog is newer than this index, or was edited behind its back
+                self.catalog.remove(set(self.catalog.paths(self.skill_library_path)) - indexed)
+                self._sync_catalog([*self.vector_store, *self.pending])
+
+    def _load(self):
+        """Load the index files of `vectordb_path`, with the write lock held."""
+        # embeddings are memory-mapped, only the metadata sidecar is parsed here
+        store = EmbeddingStore(self.vectordb_path)
+        if any(field in skill for skill in store.skills.values() for field in HEAVY_FIELDS):
+            # metadata indexed before it was slimmed down
+            for skill in store.skills.values():
+                for field in HEAVY_FIELDS:
+                    skill.pop(field, None)
+            store.save()
+        unhashed = [] if self.static else [key for key, skill in store.skills.items() if "content_hash" not in skill and os.path.isdir(key)]
+        if len(unhashed) > 0:
+            # metadata indexed before skills had a content hash, the catalog and the object store key versions by it
+            for key in unhashed:
+                store.skills[key]["content_hash"] = read_skill(key)[0]["content_hash"]
+            store.save()
+        manifest = SkillManifest(self.vectordb_path)
+        model_name = embedding_model_name(self.embedding_model)
+        indexed_model = store.embedding_model
+        if not indexed_model and store.rows > 0:
+            # indexes built before the model was recorded were all embedded with OpenAI
+            dimension = embedding_dimension(self.embedding_model)
+            legacy = type(self.embedding_model).__name__ == LEGACY_EMBEDDING_BACKEND and dimension in (None, store.dim)
+            indexed_model = model_name if legacy else f"{LEGACY_EMBEDDING_BACKEND}/{store.dim} dimensions"
+        if self.static and indexed_model != model_name:
+            raise ValueError(f"The index in {self.vectordb_path} was built with {indexed_model}, it cannot be searched with {model_name}")
+        if indexed_model and indexed_model != model_name:
+            # vectors of different models are not comparable, every skill is embedded again
+            logger.warning(f"Embedding model changed from {indexed_model} to {model_name}, rebuilding the vector database.")
+            store.reset()
+            manifest.reset()
+        store.embedding_model = model_name
+        quantized = None
+        if config.vectordb_quantization != "none":
+            quantized = QuantizedMatrix(self.vectordb_path, quantization=config.vectordb_quantization)
+        lexical = BM25Index(self.vectordb_path)
+        # skills waiting for an embedding are saved in the lexical index too, the next scan reports them again
+        if set(lexical.docs) != set(store.skills):
+            for key in set(lexical.docs) - set(store.skills):
+                lexical.remove(key)
+            for key, skill in store.skills.items():
+                lexical.add(key, skill)
+            lexical.save()
+        with self.lock:
+            self.store = store
+            self.vector_store = store.skills
+            self.manifest = manifest
+            self.ann = IVFIndex(self.vectordb_path, nprobe=config.vectordb_ann_nprobe)
+            self.quantized = quantized
+            self.lexical = lexical
+            # skill dir -> skill json of the skills that failed to embed, searched lexically until they are
+            self.pending = {}
+            self.metadata_index.build(store)
 
-        for root, dirs, files in os.walk(self.skill_library_path):
-            for file in files:
-                if root not in self.vector_store and file == "embedding_text.txt":
-                    embedding_text_path = os.path.join(root, file)
-                    with open(embedding_text_path, mode="r", encoding="utf-8") as f:
-                        embedding_text = f.read()
-                    
-                    skill_path = os.path.join(root, "skill.json")
-                    with open(skill_path, encoding="utf-8") as f:
-                        skill_json = json.load(f)
-                    skill_json["skill_id"] = root
-                    skill_json["embedding_text"] = embedding_text
-                    self.vector_store[root] = skill_json
-
-        # index embedding_texts
-        no_embedding_obj = {key:value for key, value in self.vector_store.items() if "embedding" not in value}
-        if len(no_embedding_obj) > 0:
-            no_embedding_texts = []
-            sorted_keys = sorted(no_embedding_obj)
-            for key in sorted_keys:
-                no_embedding_texts.append(no_embedding_obj[key]["embedding_text"])
-
-            embeddings = self.embedding_model.embed_documents(no_embedding_texts)
-            for i, key in enumerate(sorted_keys):
-                self.vector_store[key]["embedding"] = embeddings[i]
-        
-        self.sorted_keys = sorted(self.vector_store)
+    @property
+    def embeddings(self):
+        return self.store.matrix
+
+    def refresh(self, defer_embedding: bool = False):
+        """
+        Update the index only if the manifest says the skill library changed, or another process updated it.
+        With `defer_embedding`, skills that fail to embed are left out of the index and retried by the next refresh,
+        instead of raising.
+        """
+        if self.auto_refresh and not self.static and (self.manifest.is_stale(self.skill_library_path) or not self.store.is_current()):
+            self.update_index(defer_embedding=defer_embedding)
+
+    def update_index(self, defer_embedding: bool = False):
+        with self.write_lock:
+            if not self.store.is_current():
+                # another process updated the index, start from its files so its skills are not embedded again
+                self._load()
+            self._update_index(defer_embedding=defer_embedding)
+
+    def _update_index(self, defer_embedding: bool = False):
+        # diff the skill library against the manifest, only touched skills are read
+        to_embed = []
         embeddings = []
-        for key in self.sorted_keys:
-            embeddings.append(self.vector_store[key]["embedding"])
-        self.embeddings = np.array(embeddings)
-        # save to vectordb
-        with open(self.vectordb_path, "w", encoding="utf-8") as f:
-            json.dump(self.vector_store, f)
-
-    def save_query_cache(self):
-        with open(self.query_cache_path, "w", encoding="utf-8") as f:
-            json.dump(self.query_cache, f)
-        
-    def search(self, query: str, top_k: int = 3, threshold=0.8) -> List[dict]:
-        key = str((query, top_k, threshold))
-        if key in self.query_cache:
-            return self.query_cache[key]
-
-        self.update_index()
-
-        query_embedding = self.embedding_model.embed_query(query)
-        query_embedding = np.array(query_embedding)
-        indexes, scores = cosine_similarity(docs_matrix=self.embeddings, query_vec=query_embedding, k=top_k)
+        deferred = {}
+        try:
+            changed, removed = ({}, []) if self.static else self.manifest.scan(self.skill_library_path, known_skills=self.vector_store)
+            # only skills whose embedding_text changed are re-embedded, the others just refresh their metadata
+            to_embed = sorted(key for key in changed if self._embedding_hash(key) != changed[key]["embedding_hash"])
+            # copies of a skill already indexed (e.g. pulled from several hub repos) reuse its row
+            by_content = {skill["content_hash"]: skill for skill in self.vector_store.values() if "content_hash" in skill}
+            reused = {}
+            for key in to_embed:
+                indexed = by_content.get(changed[key]["content_hash"])
+                if indexed is not None and indexed.get("embedding_hash") == changed[key]["embedding_hash"]:
+                    reused[key] = np.array(self.embeddings[indexed["embedding_row"]])
+            missing = [key for key in to_embed if key not in reused]
+            if len(missing) > 0:
+                embedding_texts = [changed[key]["embedding_text"] for key in missing]
+                # deferred skills are retried by the next refresh, not by backing off here
+                pipeline = create_embedding_pipeline(max_retries=0) if defer_embedding else self.embedding_pipeline
+                try:
+                    reused.update(zip(missing, self.embedding_cache.embed_documents(self.embedding_model, embedding_texts, pipeline=pipeline)))
+                except Exception as e:
+                    if not defer_embedding:
+                        raise
+                    logger.warning(f"Failed to embed {len(missing)} skills, they are left out of the index until the next refresh: {e}")
+                    # only their vectors wait, skills already indexed keep their previous vector meanwhile
+                    self.manifest.defer(missing)
+                    deferred = {key: changed.pop(key) for key in missing}
+                    to_embed = [key for key in to_embed if key in reused]
+            embeddings = [reused[key] for key in to_embed]
+        except Exception:
+            # keep the manifest on disk as the source of truth so the next refresh retries
+            self.manifest = SkillManifest(self.vectordb_path)
+            raise
+        # searches keep running on the current index while skills are embedded, they only wait for the swap
+        with self.lock:
+            self._apply_changes(changed, removed, to_embed, embeddings, deferred)
+
+    def _apply_changes(self, changed: dict, removed: list, to_embed: list, embeddings, deferred: dict) -> None:
+        generation = self.store.generation
+        try:
+            self.store.replace_metadata({key: changed[key] for key in changed if key not in to_embed})
+            if len(to_embed) > 0:
+                self.store.upsert({key: changed[key] for key in to_embed}, embeddings)
+            if len(removed) > 0:
+                self.store.remove(removed)
+            for key in changed:
+                self.lexical.add(key, changed[key])
+                self.pending.pop(key, None)
+            for key in removed:
+                self.lexical.remove(key)
+                self.pending.pop(key, None)
+            for key in deferred:
+                self.lexical.add(key, deferred[key])
+            self.pending.update(deferred)
+        except Exception:
+            self.manifest = SkillManifest(self.vectordb_path)
+            raise
+        if self.store.dead_rows > self.compact_dead_ratio * self.store.rows:
+            self.store.compact()
+        elif len(changed) > 0 or len(removed) > 0:
+            self.store.save()
+        if len(changed) > 0 or len(removed) > 0 or len(deferred) > 0:
+            self.lexical.save()
+        if len(changed) > 0 or len(removed) > 0 or self.metadata_index.rows != self.store.rows:
+            self.metadata_index.build(self.store)
+        self.manifest.save()
+        self._sync_row_indexes(changed_rows=[self.store.skills[key]["embedding_row"] for key in to_embed])
+        if self.catalog is not None:
+            self.catalog.remove(removed)
+            # compaction renumbers every row
+            self._sync_catalog(self.vector_store if self.store.generation != generation else changed)
+            if len(deferred) > 0:
+                self._sync_catalog(deferred)
+
+    def _sync_row_indexes(self, changed_rows=()) -> None:
+        """Bring the indexes over embedding rows up to date with the store, they rebuild themselves when rows were renumbered."""
+        if self._use_ann():
+            self.ann.sync(self.store, changed_rows=changed_rows)
+        if self.quantized is not None:
+            self.quantized.sync(self.store, changed_rows=changed_rows)
+
+    def _sync_catalog(self, keys) -> None:
+        skills = {key: self.pending.get(key) or self.vector_store[key] for key in keys}
+        self.catalog.upsert(skills)
+        # pending skills have no row yet
+        self.catalog.set_embedding_rows({key: skill["embedding_row"] for key, skill in skills.items() if "embedding_row" in skill})
+
+    def _use_ann(self):
+        # brute force stays exact and fast enough for small libraries
+        return len(self.vector_store) >= config.vectordb_ann_threshold
+
+    def _embedding_hash(self, key):
+        if key not in self.vector_store:
+            return None
+        skill = self.vector_store[key]
+        return skill.get("embedding_hash") or text_hash(skill["embedding_text"])
+
+    def compact(self):
+        """Rewrite the store without the rows of removed skills."""
+        with self.write_lock:
+            if not self.store.is_current():
+                self._load()
+            with self.lock:
+                generation = self.store.generation
+                self.store.compact()
+                if self.store.generation == generation:
+                    return
+                # every row was renumbered
+                self.metadata_index.build(self.store)
+                self._sync_row_indexes()
+                if self.catalog is not None:
+                    self._sync_catalog(self.vector_store)
+
+    def embed_queries(self, queries: List[str]) -> list:
+        """Embed queries, only normalized query texts never seen before reach the embedding model, in one batch."""
+        normalized = [normalize_query(query) for query in queries]
+        return self.query_cache.embed_documents(self.embedding_model, normalized)
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters of the query and embedding caches, for monitoring."""
+        return {"query_cache": self.query_cache.stats(), "embedding_cache": self.embedding_cache.stats()}
+
+    def _to_results(self, hits) -> List[dict]:
         results = []
-        for i, index in enumerate(indexes):
-            if scores[i] < threshold:
-                break
-            result = self.vector_store[self.sorted_keys[index]]
-            result = result.copy()
-            result.pop("embedding")
-            result["score"] = scores[i]
+        for key, score in hits:
+            result = (self.pending.get(key) or self.vector_store[key]).copy()
+            result.pop("embedding_row", None)
+            result["score"] = float(score)
             results.append(result)
-        self.query_cache[key] = results
-        self.save_query_cache()
         return results
 
+    def _vector_search(self, queries: List[str], top_k: int, threshold, rows=None, query_embeddings=None) -> List[list]:
+        if rows is not None and len(rows) == 0:
+            return [[] for _ in queries]
+        if query_embeddings is None:
+            query_embeddings = self.embed_queries(queries)
+        if self._use_ann() and self.ann.is_trained and (rows is None or len(rows) >= config.vectordb_ann_threshold):
+            mask = self.store.live
+            if rows is not None:
+                mask = np.zeros(self.store.rows, dtype=bool)
+                mask[rows] = True
+            if self.quantized is not None:
+                # the codes of the IVF candidates are scored, only the best ones are re-ranked on the float32 matrix
+                scored = [
+                    self.quantized.search_many(
+                        exact_matrix=self.embeddings, query_matrix=np.asarray([query_embedding]), k=top_k, threshold=threshold,
+                        rows=self.ann.candidates(query_embedding, mask=mask), rerank=config.vectordb_rerank_factor,
+                    )[0]
+                    for query_embedding in query_embeddings
+                ]
+            else:
+                scored = [self.ann.search(docs_matrix=self.embeddings, query_vec=query_embedding, k=top_k, threshold=threshold, mask=mask) for query_embedding in query_embeddings]
+        elif self.quantized is not None:
+            # coarse scoring on the quantized matrix, exact re-ranking of the best candidates
+            scored = self.quantized.search_many(
+                exact_matrix=self.embeddings, query_matrix=query_embeddings, k=top_k, threshold=threshold,
+                mask=self.store.live, rows=rows, rerank=config.vectordb_rerank_factor,
+            )
+        elif rows is not None:
+            # filtered search: only the matching rows are gathered from the matrix and scored
+            scored = cosine_similarity_many(docs_matrix=self.embeddings[rows], query_matrix=query_embeddings, k=top_k, threshold=threshold)
+            scored = [(rows[indexes], scores) for indexes, scores in scored]
+        else:
+            scored = cosine_similarity_many(docs_matrix=self.embeddings, query_matrix=query_embeddings, k=top_k, threshold=threshold, mask=self.store.live)
+        return [[(self.store.row_keys[index], score) for index, score in zip(indexes, scores)] for indexes, scores in scored]
+
+    def search(self, query: str, top_k: int = 3, threshold=0.8, mode: str = "vector", filters: Optional[dict] = None) -> List[dict]:
+        return self.search_many([query], top_k=top_k, threshold=threshold, mode=mode, filters=filters)[0]
+
+    def search_many(self, queries: List[str], top_k: int = 3, threshold=0.8, mode: str = "vector", filters: Optional[dict] = None, query_embeddings=None) -> List[List[dict]]:
+        """
+        Search several queries with a single embedding call and a single matrix-matrix product.
+
+        mode:
+            - vector: cosine similarity of the embeddings, scores are filtered by `threshold`
+            - lexical: BM25 over skill names, tags, descriptions and usage examples, no embedding call and no threshold
+            - hybrid: reciprocal rank fusion of both rankings, `threshold` only filters the vector candidates
+        filters:
+            metadata the skills must match before they are scored, keys among language, tags, author and version,
+            values are a string or a list of accepted strings, e.g. {"language": "python", "tags": ["pdf"]}
+        query_embeddings:
+            embeddings of the queries when the caller already has them, skips `embed_queries`
+        """
+        assert mode in SEARCH_MODES, f"mode should be one of {SEARCH_MODES}, got {mode}"
+        # lexical searches need no embedding, they run on the skills indexed so far rather than fail offline
+        self.refresh(defer_embedding=mode == "lexical")
+        if len(self.vector_store) == 0 and (mode != "lexical" or len(self.pending) == 0):
+            return [[] for _ in queries]
+        if mode != "lexical" and query_embeddings is None:
+            query_embeddings = self.embed_queries(queries)
+        with self.lock:
+            return self._search_many(queries, top_k, threshold, mode, filters, query_embeddings)
+
+    def _search_many(self, queries: List[str], top_k: int, threshold, mode: str, filters: Optional[dict], query_embeddings) -> List[List[dict]]:
+        rows = None
+        allowed = None
+        if filters:
+            rows = np.flatnonzero(self.store.live & self.metadata_index.mask(filters))
+            allowed = {self.store.row_keys[row] for row in rows if self.store.row_keys[row] not in self.pending}
+            allowed |= {key for key, skill in self.pending.items() if matches(skill, filters)}
+
+        if mode == "lexical":
+            return [self._to_results(self.lexical.search(query, k=top_k, allowed=allowed)) for query in queries]
+        if mode == "vector":
+            return [self._to_results(hits) for hits in self._vector_search(queries, top_k, threshold, rows=rows, query_embeddings=query_embeddings)]
+
+        candidates = top_k * self.hybrid_candidates
+        results = []
+        for query, vector_hits in zip(queries, self._vector_search(queries, candidates, threshold, rows=rows, query_embeddings=query_embeddings)):
+            fused = {}
+            for hits in (vector_hits, self.lexical.search(query, k=candidates, allowed=allowed)):
+                for rank, (key, _) in enumerate(hits):
+                    fused[key] = fused.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            results.append(self._to_results(sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]))
+        return results
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def create_embedding_cache() -> EmbeddingCache:
+    return EmbeddingCache(
+        os.path.join(config.local_skill_library_vectordb_path, "embedding_cache.db"),
+        max_size=config.embedding_cache_size,
+    )
+
+
+def create_embedding_pipeline(max_retries: Optional[int] = None) -> EmbeddingPipeline:
+    return EmbeddingPipeline(
+        batch_size=config.embedding_batch_size,
+        max_workers=config.embedding_max_workers,
+        max_retries=config.embedding_max_retries if max_retries is None else max_retries,
+        requests_per_minute=config.embedding_requests_per_minute,
+    )
+
+
+def create_query_cache(vectordb_path: str) -> EmbeddingCache:
+    return EmbeddingCache(
+        os.path.join(vectordb_path, "query_cache.db"),
+        max_size=config.query_cache_size,
+        ttl=config.query_cache_ttl,
+    )
@@ -0,0 +1,143 @@
+import numpy as np
+import hashlib
+import sqlite3
+import threading
+import time
+import os
+from typing import Optional
+
+
+def embedding_model_name(embedding_model) -> str:
+    """Name identifying the vectors an embedding model produces, e.g. `OpenAIEmbeddings/text-embedding-ada-002`."""
+    model = getattr(embedding_model, "deployment", None) or getattr(embedding_model, "model", None) or ""
+    return f"{type(embedding_model).__name__}/{model}"
+
+
+# output dimension of embedding models that do not tell it
+EMBEDDING_DIMENSIONS = {"text-embedding-ada-002": 1536, "text-embedding-3-small": 1536, "text-embedding-3-large": 3072}
+
+
+def embedding_dimension(embedding_model) -> Optional[int]:
+    """Size of the vectors of an embedding model, without calling it, None when unknown."""
+    dimension = getattr(embedding_model, "dimension", None) or getattr(embedding_model, "dimensions", None)
+    return dimension or EMBEDDING_DIMENSIONS.get(getattr(embedding_model, "model", None))
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by sha256(embedding model name, text), stored in sqlite.
+
+    The same text is only ever embedded once per model, whatever library root or vector store asks for it.
+    The least recently used entries are evicted once the cache holds more than `max_size` embeddings,
+    and entries older than `ttl` seconds are treated as misses. A miss costs one small insert,
+    never a rewrite of the whole cache. `hits` and `misses` count lookups since the cache was opened.
+    `embed_documents` can be called from several threads, the embedding model calls are not serialized.
+    """
+
+    def __init__(self, path: str, max_size: int = 100000, ttl=None):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        # several processes may open the cache at once, the schema is checked and migrated by one of them at a time
+        self.connection.execute("BEGIN IMMEDIATE")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(embeddings)")]
+        if "created_at" not in columns:
+            self.connection.execute("ALTER TABLE embeddings ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.connection.commit()
+        self.size = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model_name: str, texts) -> dict:
+        """Return {text: vector} for the texts found in the cache and mark them as recently used."""
+        keys = {self.key(model_name, text): text for text in texts}
+        found = {}
+        now = time.time()
+        expired = []
+        key_list = list(keys)
+        # stay below sqlite's limit of bound parameters per statement
+        for start in range(0, len(key_list), 500):
+            batch = key_list[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT key, vector, created_at FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            for key, vector, created_at in rows:
+                if self.ttl is not None and now - created_at > self.ttl:
+                    expired.append(key)
+                    continue
+                found[keys[key]] = np.frombuffer(vector, dtype=np.float32)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        if len(expired) > 0:
+            self.connection.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key in expired])
+            self.size -= len(expired)
+        if len(found) > 0:
+            self.connection.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(now, self.key(model_name, text)) for text in found],
+            )
+        if len(found) > 0 or len(expired) > 0:
+            self.connection.commit()
+        return found
+
+    def put_many(self, model_name: str, texts, vectors) -> None:
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used, created_at) VALUES (?, ?, ?, ?)",
+            [(self.key(model_name, text), np.asarray(vector, dtype=np.float32).tobytes(), now, now) for text, vector in zip(texts, vectors)],
+        )
+        self.size += len(texts)
+        if self.size > self.max_size:
+            self.size = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self.connection.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (max(0, self.size - self.max_size),),
+            )
+            self.size = min(self.size, self.max_size)
+        self.connection.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": self.size,
+            "max_size": self.max_size,
+        }
+
+    def embed_documents(self, embedding_model, texts, pipeline=None) -> list:
+        """
+        Embed `texts` with `embedding_model`, only texts missing from the cache are sent.
+        Without a pipeline they are sent in one batch, with an `EmbeddingPipeline` in concurrent chunks,
+        each chunk cached as soon as it is embedded so an interrupted build resumes where it stopped.
+        """
+        model_name = embedding_model_name(embedding_model)
+        with self.lock:
+            found = self.get_many(model_name, texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in found))
+        if len(missing) > 0:
+            def checkpoint(batch, vectors):
+                with self.lock:
+                    self.put_many(model_name, batch, vectors)
+
+            if pipeline is None:
+                vectors = embedding_model.embed_documents(missing)
+                checkpoint(missing, vectors)
+            else:
+                vectors = pipeline.embed(embedding_model, missing, on_batch=checkpoint)
+            found.update(zip(missing, vectors))
+        return [found[text] for text in texts]
@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from creator.config.library import config
+
+from .locking import FileLock
+from .manifest import SkillManifest, read_skill
+
+
+# bumped when rows must be rewritten, stored as the sqlite user_version
+CATALOG_VERSION = 1
+# catalog column of every filter accepted by `SkillCatalog.list`
+FILTER_COLUMNS = {"language": "language", "author": "author", "version": "version"}
+
+
+class SkillCatalog:
+    """
+    Catalog of every known skill directory, stored in sqlite (WAL mode) next to the vector db.
+
+    One row per skill with its name, path, language, tags, author, version, content hash and embedding row,
+    indexed on name, language, author, version and tag. `CodeSkill.save` records a skill in one transaction,
+    vector stores keep the rows of the skills they indexed in sync, so listing skills, finding a skill by name
+    or filtering by metadata are index lookups instead of directory walks.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS skills (
+                path TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                language TEXT,
+                tags TEXT NOT NULL DEFAULT '[]',
+                author TEXT,
+                version TEXT,
+                content_hash TEXT,
+                embedding_row INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS skills_name ON skills (name);
+            CREATE INDEX IF NOT EXISTS skills_language ON skills (language);
+            CREATE INDEX IF NOT EXISTS skills_author ON skills (author);
+            CREATE INDEX IF NOT EXISTS skills_version ON skills (version);
+            CREATE TABLE IF NOT EXISTS skill_tags (
+                path TEXT NOT NULL,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (path, tag)
+            );
+            CREATE INDEX IF NOT EXISTS skill_tags_tag ON skill_tags (tag);
+        """)
+        self.connection.commit()
+        # rows recorded before paths were normalized, vector stores record them again under their absolute path
+        self._delete([path for (path,) in self.connection.execute("SELECT path FROM skills") if path != os.path.abspath(path)])
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] < CATALOG_VERSION:
+            self._rehash()
+
+    def _rehash(self) -> None:
+        # catalogs before version 1 stored a digest of the skill files as content_hash
+        hashes = {}
+        for (path,) in self.connection.execute("SELECT path FROM skills").fetchall():
+            try:
+                hashes[path] = read_skill(path)[0]["content_hash"]
+            except (OSError, ValueError):
+                hashes[path] = None
+        self._delete([path for path, content_hash in hashes.items() if content_hash is None])
+        with self.lock, self.connection:
+            self.connection.executemany("UPDATE skills SET content_hash = ? WHERE path = ?", [(content_hash, path) for path, content_hash in hashes.items() if content_hash is not None])
+            self.connection.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+
+    def upsert(self, skills: dict) -> None:
+        """
+        Record skills (skill_dir -> skill json, as read by `read_skill`) in one transaction, embedding rows of known skills are kept.
+        The content hash is the `skill_content_hash` of the skill json, the one the object store and `get_skill` use.
+        """
+        rows = []
+        tags = []
+        for skill_dir, skill in skills.items():
+            # rows are keyed by absolute path, `_under` ranges over them
+            path = os.path.abspath(skill_dir)
+            metadata = skill.get("skill_metadata") or {}
+            skill_tags = [tag.lower() for tag in skill.get("skill_tags") or []]
+            rows.append((
+                path, skill["skill_name"], skill.get("skill_program_language"), json.dumps(skill_tags, ensure_ascii=False),
+                metadata.get("author"), metadata.get("version"), skill.get("content_hash"),
+            ))
+            tags.extend((path, tag) for tag in dict.fromkeys(skill_tags))
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO skills (path, name, language, tags, author, version, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET name = excluded.name, language = excluded.language, tags = excluded.tags, "
+                "author = excluded.author, version = excluded.version, content_hash = excluded.content_hash",
+                rows,
+            )
+            self.connection.executemany("DELETE FROM skill_tags WHERE path = ?", [(row[0],) for row in rows])
+            self.connection.executemany("INSERT INTO skill_tags (path, tag) VALUES (?, ?)", tags)
+
+    def record(self, skill_dir: str) -> None:
+        """Record a skill directory as it is on disk."""
+        skill_dir = os.path.abspath(skill_dir)
+        self.upsert({skill_dir: read_skill(skill_dir)[0]})
+
+    def remove(self, paths) -> None:
+        self._delete([os.path.abspath(path) for path in paths])
+
+    def _delete(self, paths) -> None:
+        # rows by their exact path
+        with self.lock, self.connection:
+            self.connection.executemany("DELETE FROM skills WHERE path = ?", [(path,) for path in paths])
+            self.connection.executemany("DELETE FROM skill_tags WHERE path = ?", [(path,) for path in paths])
+
+    def sync(self, root: str, manifest: SkillManifest) -> None:
+        """Record the skills of `root` added, changed or removed since `manifest` last scanned it, without indexing them."""
+        root = os.path.abspath(root)
+        if not manifest.is_stale(root):
+            return
+        changed, removed = manifest.scan(root, known_skills=set(self.paths(root)))
+        self.remove(removed)
+        self.upsert(changed)
+        manifest.save()
+
+    def set_embedding_rows(self, rows: dict) -> None:
+        with self.lock, self.connection:
+            self.connection.executemany("UPDATE skills SET embedding_row = ? WHERE path = ?", [(row, os.path.abspath(path)) for path, row in rows.items()])
+
+    def paths(self, root: str) -> list:
+        """Paths of the skills recorded under `root`."""
+        where, params = _under(root)
+        with self.lock:
+            return [row[0] for row in self.connection.execute(f"SELECT path FROM skills WHERE {where}", params)]
+
+    def find(self, name: str, root: Optional[str] = None) -> list:
+        """Skills named `name`, optionally only under `root`."""
+        return self.list(root=root, name=name)
+
+    def list(self, root: Optional[str] = None, filters: Optional[dict] = None, name: Optional[str] = None) -> list:
+        """
+        Recorded skills as dicts, sorted by path. Filters use the keys of search filters (language, tags, author, version),
+        the columns are ANDed and the accepted values of each column ORed.
+        """
+        clauses, params = [], []
+        if root is not None:
+            where, root_params = _under(root)
+            clauses.append(where)
+            params.extend(root_params)
+        if name is not None:
+            clauses.append("name = ?")
+            params.append(name)
+        for column, values in (filters or {}).items():
+            assert column in FILTER_COLUMNS or column == "tags", f"filter should be one of {list(FILTER_COLUMNS) + ['tags']}, got {column}"
+            if values is None:
+                continue
+            values = list(values) if isinstance(values, (list, tuple, set)) else [values]
+            placeholders = ",".join("?" * len(values))
+            if column == "tags":
+                clauses.append(f"path IN (SELECT path FROM skill_tags WHERE tag IN ({placeholders}))")
+                params.extend(value.lower() for value in values)
+            else:
+                clauses.append(f"{FILTER_COLUMNS[column]} IN ({placeholders})")
+                params.extend(values)
+        query = "SELECT path, name, language, tags, author, version, content_hash, embedding_row FROM skills"
+        if len(clauses) > 0:
+            query += " WHERE " + " AND ".join(clauses)
+        with self.lock:
+            rows = self.connection.execute(query + " ORDER BY path", params).fetchall()
+        keys = ("path", "name", "language", "tags", "author", "version", "content_hash", "embedding_row")
+        skills = [dict(zip(keys, row)) for row in rows]
+        for skill in skills:
+            skill["tags"] = json.loads(skill["tags"])
+        return skills
+
+
+def _under(root: str):
+    # a range over the primary key instead of LIKE, so it stays an index lookup
+    prefix = os.path.abspath(root).rstrip(os.sep) + os.sep
+    return "path >= ? AND path < ?", [prefix, prefix[:-1] + chr(ord(os.sep) + 1)]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_skill_catalog() -> SkillCatalog:
+    """The catalog shared by the whole process, stored as `skill_catalog.db` in the vector db directory."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = SkillCatalog(os.path.join(config.local_skill_library_vectordb_path, "skill_catalog.db"))
+        return _catalog
+
+
+def sync_skill_catalog(roots: dict) -> SkillCatalog:
+    """
+    Bring the shared catalog up to date with `roots` (name -> skill library root), as `list_skills` and `get_skill` need it.
+    Each root keeps its own manifest next to the vector db, only the libraries that changed are scanned and nothing is embedded.
+    """
+    catalog = get_skill_catalog()
+    vectordb_path = config.local_skill_library_vectordb_path
+    with FileLock(os.path.join(vectordb_path, "skill_catalog.lock")):
+        for name, root in roots.items():
+            if os.path.isdir(root):
+                catalog.sync(root, SkillManifest(vectordb_path, name=f"catalog_manifest_{name}"))
+    return catalog
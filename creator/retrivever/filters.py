@@ -0,0 +1,77 @@
+import numpy as np
+
+
+def _language(skill: dict) -> list:
+    return [skill.get("skill_program_language") or ""]
+
+
+def _tags(skill: dict) -> list:
+    return [tag.lower() for tag in skill.get("skill_tags") or []]
+
+
+def _author(skill: dict) -> list:
+    return [(skill.get("skill_metadata") or {}).get("author", "")]
+
+
+def _version(skill: dict) -> list:
+    return [(skill.get("skill_metadata") or {}).get("version", "")]
+
+
+FILTER_COLUMNS = {
+    "language": _language,
+    "tags": _tags,
+    "author": _author,
+    "version": _version,
+}
+
+
+def matches(skill: dict, filters: dict) -> bool:
+    """Whether a skill json passes `filters`, same rules as `MetadataIndex.mask`."""
+    for column, values in filters.items():
+        assert column in FILTER_COLUMNS, f"filter should be one of {list(FILTER_COLUMNS)}, got {column}"
+        if values is None:
+            continue
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        if column == "tags":
+            values = [value.lower() for value in values]
+        if not set(values) & set(FILTER_COLUMNS[column](skill)):
+            return False
+    return True
+
+
+class MetadataIndex:
+    """
+    Columnar index over skill metadata: for every column and value, the array of matrix rows holding it.
+    Row arrays instead of dense bitmaps keep memory proportional to the metadata, not to rows * distinct values.
+
+    `mask(filters)` turns the filters into a boolean row mask, ANDing the columns and ORing the values
+    of each column, e.g. `{"language": "python", "tags": ["pdf", "csv"]}` keeps python skills tagged pdf or csv.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = {column: {} for column in FILTER_COLUMNS}
+
+    def build(self, store) -> None:
+        columns = {column: {} for column in FILTER_COLUMNS}
+        for skill in store.skills.values():
+            for column, values in FILTER_COLUMNS.items():
+                for value in values(skill):
+                    columns[column].setdefault(value, []).append(skill["embedding_row"])
+        self.columns = {column: {value: np.array(rows, dtype=np.int64) for value, rows in values.items()} for column, values in columns.items()}
+        self.rows = store.rows
+
+    def mask(self, filters: dict):
+        mask = np.ones(self.rows, dtype=bool)
+        for column, values in filters.items():
+            assert column in FILTER_COLUMNS, f"filter should be one of {list(FILTER_COLUMNS)}, got {column}"
+            if values is None:
+                continue
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            if column == "tags":
+                values = [value.lower() for value in values]
+            column_mask = np.zeros(self.rows, dtype=bool)
+            for value in values:
+                column_mask[self.columns[column].get(value, [])] = True
+            mask &= column_mask
+        return mask
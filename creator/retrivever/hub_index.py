@@ -0,0 +1,52 @@
+import os
+
+from creator.llm import create_embedding
+from creator.config.library import config
+from creator.hub.huggingface import hf_pull_index
+
+from .base import BaseVectorStore, create_embedding_cache, create_embedding_pipeline
+from .cache import embedding_model_name
+from .manifest import is_skill_dir, read_skill
+from .storage import EmbeddingStore
+
+
+# folder of a hub repo holding its search index
+INDEX_DIR = "index"
+
+
+def build_hub_index(repo_dir: str, index_dir: str = "") -> EmbeddingStore:
+    """
+    Build the search index of a local clone of a hub repo into `<repo_dir>/index`, to be pushed along with the skills.
+
+    Every skill of the repo becomes one row, keyed by its path inside the repo (its `huggingface_skill_path`).
+    The index must be built with the embedding model used to search it.
+    """
+    index_dir = index_dir or os.path.join(repo_dir, INDEX_DIR)
+    skills = {}
+    for root, dirs, files in os.walk(repo_dir):
+        dirs[:] = sorted(d for d in dirs if d != ".git" and os.path.join(root, d) != index_dir)
+        if not is_skill_dir(files):
+            continue
+        skill_json, _ = read_skill(root)
+        skill_path = os.path.relpath(root, repo_dir).replace(os.sep, "/")
+        skill_json["skill_id"] = skill_path
+        skill_json["huggingface_skill_path"] = skill_path
+        skills[skill_path] = skill_json
+
+    embedding_model = create_embedding(backend=config.embedding_backend)
+    embedding_texts = [skill["embedding_text"] for skill in skills.values()]
+    embeddings = create_embedding_cache().embed_documents(embedding_model, embedding_texts, pipeline=create_embedding_pipeline())
+    os.makedirs(index_dir, exist_ok=True)
+    store = EmbeddingStore(index_dir)
+    store.reset()
+    store.embedding_model = embedding_model_name(embedding_model)
+    store.add(skills, embeddings)
+    store.save()
+    return store
+
+
+def load_hub_index(repo_id: str, embedding_model=None) -> BaseVectorStore:
+    """Mirror the search index of a hub repo into the vectordb path and open it as a static store."""
+    vectordb_path = os.path.join(config.local_skill_library_vectordb_path, "hub", repo_id)
+    hf_pull_index(repo_id, vectordb_path, index_dir=INDEX_DIR)
+    return BaseVectorStore(vectordb_path=vectordb_path, embedding_model=embedding_model, static=True)
@@ -0,0 +1,113 @@
+from collections import Counter
+import json
+import math
+import os
+import re
+
+
+WORD_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+SUBWORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+# name and tags are repeated so exact name/tag lookups outrank incidental mentions in descriptions
+FIELD_WEIGHTS = {
+    "skill_name": 3,
+    "skill_tags": 2,
+    "skill_description": 1,
+    "skill_usage_example": 1,
+}
+
+
+def tokenize(text: str) -> list:
+    """Lowercased words, identifiers like `pdf_page_extractor` or `PdfPageExtractor` also yield their parts."""
+    tokens = []
+    for word in WORD_PATTERN.findall(text):
+        tokens.append(word.lower())
+        parts = [part.lower() for part in SUBWORD_PATTERN.findall(word)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def skill_tokens(skill: dict) -> list:
+    tokens = []
+    for field, weight in FIELD_WEIGHTS.items():
+        value = skill.get(field) or ""
+        if isinstance(value, list):
+            value = " ".join(value)
+        tokens.extend(tokenize(value) * weight)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over skill names, tags, descriptions and usage examples.
+
+    Documents are added and removed one by one alongside the vector index, and persisted as
+    `lexical_index.json` (term frequencies per skill) next to `vector_db.json`.
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, vectordb_path: str, name: str = "lexical_index"):
+        self.path = os.path.join(vectordb_path, name + ".json")
+        self.docs = {}
+        self.lengths = {}
+        self.postings = {}
+        self.total_length = 0
+        if os.path.exists(self.path):
+            with open(self.path, mode="r", encoding="utf-8") as f:
+                for doc_id, term_frequencies in json.load(f).items():
+                    self._index(doc_id, term_frequencies)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _index(self, doc_id: str, term_frequencies: dict) -> None:
+        self.docs[doc_id] = term_frequencies
+        self.lengths[doc_id] = sum(term_frequencies.values())
+        self.total_length += self.lengths[doc_id]
+        for term, frequency in term_frequencies.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+
+    def add(self, doc_id: str, skill: dict) -> None:
+        self.remove(doc_id)
+        self._index(doc_id, dict(Counter(skill_tokens(skill))))
+
+    def remove(self, doc_id: str) -> None:
+        term_frequencies = self.docs.pop(doc_id, None)
+        if term_frequencies is None:
+            return
+        self.total_length -= self.lengths.pop(doc_id)
+        for term in term_frequencies:
+            postings = self.postings[term]
+            postings.pop(doc_id)
+            if len(postings) == 0:
+                self.postings.pop(term)
+
+    def search(self, query: str, k: int = 3, allowed=None) -> list:
+        """
+        Return up to k (doc_id, score) pairs, best first, only documents sharing a term with the query.
+        If `allowed` is given, documents outside of it are skipped.
+        """
+        if len(self.docs) == 0:
+            return []
+        average_length = self.total_length / len(self.docs)
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self.docs) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / average_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores.most_common(k)
+
+    def save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.docs, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+
+from creator.utils.skill_pack import PACK_FILE, SkillPack
+from creator.utils.content_hash import skill_content_hash
+
+
+SKILL_FILES = ("skill.json", "embedding_text.txt")
+# left out of the index metadata, search results load them from the skill directory when needed
+HEAVY_FIELDS = ("conversation_history", "skill_code", "test_summary")
+
+
+def is_skill_dir(files) -> bool:
+    """Whether a directory holding `files` is a skill, saved in the legacy layout or as a pack."""
+    return PACK_FILE in files or all(file in files for file in SKILL_FILES)
+
+
+def skill_mtime(skill_dir: str) -> int:
+    pack_path = os.path.join(skill_dir, PACK_FILE)
+    if os.path.exists(pack_path):
+        return os.stat(pack_path).st_mtime_ns
+    return max(os.stat(os.path.join(skill_dir, file)).st_mtime_ns for file in SKILL_FILES)
+
+
+def read_skill(skill_dir: str):
+    """Read `skill.json` and `embedding_text.txt`, return the skill json without its heavy fields and a hash of both files"""
+    pack_path = os.path.join(skill_dir, PACK_FILE)
+    if os.path.exists(pack_path):
+        # the packed skill.json has no heavy fields, both entries come with the first read of the pack
+        pack = SkillPack(pack_path)
+        embedding_text = pack.read("embedding_text.txt")
+        skill_bytes = pack.read("skill.json")
+        skill_code = pack.read_field("skill_code")
+    else:
+        with open(os.path.join(skill_dir, "embedding_text.txt"), mode="rb") as f:
+            embedding_text = f.read()
+        with open(os.path.join(skill_dir, "skill.json"), mode="rb") as f:
+            skill_bytes = f.read()
+        skill_code = None
+    # the code of a pack is not in its skill.json
+    digest = hashlib.sha256(embedding_text + b"\0" + skill_bytes + (b"\0" + skill_code.encode("utf-8") if skill_code is not None else b"")).hexdigest()
+    skill_json = json.loads(skill_bytes)
+    # identical skills share their content hash wherever they are saved, whatever their metadata
+    skill_json["content_hash"] = skill_content_hash(skill_json if skill_code is None else {**skill_json, "skill_code": skill_code})
+    for field in HEAVY_FIELDS:
+        skill_json.pop(field, None)
+    skill_json["skill_id"] = skill_dir
+    skill_json["embedding_text"] = embedding_text.decode("utf-8")
+    skill_json["embedding_hash"] = text_hash(skill_json["embedding_text"])
+    return skill_json, digest
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SkillManifest:
+    """
+    Manifest of the indexed skill directories, persisted as `manifest.json` next to the vector db.
+
+    - dirs: mtime of every non-skill directory of the library (the library root, repo folders, ...).
+      Creating or deleting a skill bumps the mtime of its parent directory.
+    - skills: mtime of the skill files and of the skill directory, and content hash of every skill directory.
+      Saving a skill or renaming files over it (git, most editors) bumps the mtime of its directory, so comparing
+      the directory mtimes tells whether the library changed without reading any skill, and a rescan only reads
+      the skills whose files were touched and only reports the ones whose content really changed.
+      Files rewritten in place (e.g. `cp` over an existing skill) leave the directory mtime as it was: they are noticed
+      by the watcher (`VECTORDB_WATCH`), or by calling `update_index()`.
+    """
+
+    def __init__(self, vectordb_path: str, name: str = "manifest"):
+        self.path = os.path.join(vectordb_path, name + ".json")
+        self.dirs = {}
+        self.skills = {}
+        if os.path.exists(self.path):
+            with open(self.path, mode="r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.dirs = data["dirs"]
+            self.skills = data["skills"]
+
+    def is_stale(self, skill_library_path: str) -> bool:
+        library_dirs = [path for path in self.dirs if _is_under(path, skill_library_path)]
+        if len(library_dirs) == 0:
+            return True
+        for path in library_dirs:
+            try:
+                if os.stat(path).st_mtime_ns != self.dirs[path]:
+                    return True
+            except FileNotFoundError:
+                return True
+        for path, entry in self.skills.items():
+            if not _is_under(path, skill_library_path):
+                continue
+            try:
+                if os.stat(path).st_mtime_ns != entry.get("dir_mtime"):
+                    return True
+            except FileNotFoundError:
+                return True
+        return False
+
+    def scan(self, skill_library_path: str, known_skills=()):
+        """
+        Walk the library and diff it against the manifest.
+
+        Skills listed in `known_skills` but missing from the manifest are adopted as unchanged.
+
+        Returns:
+            changed (dict): skill_dir -> skill json, for added skills and skills whose content changed
+            removed (list): indexed skill dirs that no longer exist on disk
+        """
+        changed = {}
+        seen = set()
+        for path in [path for path in self.dirs if _is_under(path, skill_library_path)]:
+            self.dirs.pop(path)
+
+        for root, dirs, files in os.walk(skill_library_path):
+            if not is_skill_dir(files):
+                self.dirs[root] = os.stat(root).st_mtime_ns
+                continue
+            seen.add(root)
+            # before the files are read, so a write during the scan leaves the skill stale
+            dir_mtime = os.stat(root).st_mtime_ns
+            mtime = skill_mtime(root)
+            entry = self.skills.get(root)
+            if entry is not None and entry["mtime"] == mtime:
+                entry["dir_mtime"] = dir_mtime
+                continue
+            skill_json, digest = read_skill(root)
+            if (entry is None and root in known_skills) or (entry is not None and entry["hash"] == digest):
+                self.skills[root] = {"mtime": mtime, "dir_mtime": dir_mtime, "hash": digest}
+                continue
+            self.skills[root] = {"mtime": mtime, "dir_mtime": dir_mtime, "hash": digest}
+            changed[root] = skill_json
+
+        indexed = set(self.skills) | set(known_skills)
+        removed = [path for path in indexed if _is_under(path, skill_library_path) and path not in seen]
+        for path in removed:
+            self.skills.pop(path, None)
+        return changed, removed
+
+    def defer(self, skill_dirs) -> None:
+        """Mark `skill_dirs` and their parent directories as changed, so the next refresh reports them again."""
+        for skill_dir in skill_dirs:
+            # kept in the manifest, so a deleted skill is still reported as removed
+            self.skills[skill_dir] = {"mtime": 0, "hash": ""}
+            self.dirs[os.path.dirname(skill_dir)] = 0
+
+    def reset(self) -> None:
+        """Forget every directory and skill, the next scan reports the whole library as changed."""
+        self.dirs = {}
+        self.skills = {}
+
+    def save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dirs": self.dirs, "skills": self.skills}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def _is_under(path: str, root: str) -> bool:
+    path, root = os.path.abspath(path), os.path.abspath(root)
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import random
+import threading
+import time
+from loguru import logger
+
+
+class RateLimiter:
+    """Spaces calls at least 60 / `requests_per_minute` seconds apart across threads, 0 for no limit."""
+
+    def __init__(self, requests_per_minute: float = 0):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.next_call = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        if self.interval == 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = max(0.0, self.next_call - now)
+            self.next_call = max(now, self.next_call) + self.interval
+        time.sleep(delay)
+
+
+class EmbeddingPipeline:
+    """
+    Embed many texts in chunks of `batch_size`, on up to `max_workers` threads.
+
+    A failed chunk is retried up to `max_retries` times with exponential backoff and jitter.
+    `on_batch(texts, vectors)` is called as soon as a chunk is embedded, so callers can checkpoint
+    partial results: an interrupted build only embeds the chunks that never completed.
+    """
+
+    def __init__(self, batch_size: int = 256, max_workers: int = 4, max_retries: int = 5, backoff: float = 1.0, requests_per_minute: float = 0):
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = RateLimiter(requests_per_minute)
+
+    def _embed_batch(self, embedding_model, texts: list) -> list:
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                return embedding_model.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** attempt * (1 + random.random())
+                logger.warning(f"Embedding {len(texts)} texts failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed(self, embedding_model, texts: list, on_batch=None) -> list:
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            vectors = self._embed_batch(embedding_model, texts) if len(texts) > 0 else []
+            if on_batch is not None and len(texts) > 0:
+                on_batch(texts, vectors)
+            return vectors
+
+        results = [None] * len(batches)
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embedding") as executor:
+            futures = {executor.submit(self._embed_batch, embedding_model, batch): i for i, batch in enumerate(batches)}
+            try:
+                for future in as_completed(futures):
+                    i = futures[future]
+                    results[i] = future.result()
+                    if on_batch is not None:
+                        on_batch(batches[i], results[i])
+                    done += len(batches[i])
+                    logger.info(f"Embedded {done}/{len(texts)} texts")
+            except BaseException:
+                # batches already embedded were handed to on_batch, the others are dropped
+                for future in futures:
+                    future.cancel()
+                raise
+        return [vector for vectors in results for vector in vectors]
@@ -0,0 +1,140 @@
+import numpy as np
+import os
+
+from .score_functions import normalize, top_k_indices
+
+
+QUANTIZATIONS = ("none", "float16", "int8")
+CODE_DTYPES = {"float16": np.float16, "int8": np.int8}
+
+
+def quantize(vectors, quantization: str):
+    """
+    Return (codes, scales) with `codes[i] * scales[i]` approximating row `i`.
+    float16 rows keep a scale of 1, int8 rows are scaled by their largest absolute value.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if quantization == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.clip(np.round(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedMatrix:
+    """
+    Quantized copy of the `EmbeddingStore` matrix used for coarse scoring.
+
+    float16 halves and int8 quarters the bytes scanned per query compared to the float32 matrix,
+    which is only read back for the few candidates that are re-ranked exactly.
+    Codes are stored as `vector_db_quantized.bin` and opened with `np.memmap`, the per-row scales
+    and the store generation they were built from as `vector_db_quantized.npz`.
+    """
+
+    # rows dequantized at once while scoring, bounds the float32 temporaries
+    block_size = 65536
+
+    def __init__(self, vectordb_path: str, quantization: str = "int8", name: str = "vector_db_quantized"):
+        assert quantization in CODE_DTYPES, f"quantization should be one of {list(CODE_DTYPES)}, got {quantization}"
+        self.codes_path = os.path.join(vectordb_path, name + ".bin")
+        self.meta_path = os.path.join(vectordb_path, name + ".npz")
+        self.quantization = quantization
+        self.store_generation = -1
+        self.dim = 0
+        self.scales = np.zeros(0, dtype=np.float32)
+        if os.path.exists(self.meta_path) and os.path.exists(self.codes_path):
+            data = np.load(self.meta_path)
+            if str(data["quantization"]) == quantization:
+                self.store_generation = int(data["store_generation"])
+                self.dim = int(data["dim"])
+                self.scales = data["scales"]
+        self._open_codes()
+
+    @property
+    def rows(self) -> int:
+        return len(self.scales)
+
+    def _open_codes(self):
+        dtype = CODE_DTYPES[self.quantization]
+        if self.rows == 0 or self.dim == 0:
+            self.codes = np.zeros((0, self.dim), dtype=dtype)
+        else:
+            self.codes = np.memmap(self.codes_path, dtype=dtype, mode="r", shape=(self.rows, self.dim))
+
+    def sync(self, store, changed_rows=()) -> None:
+        """Quantize the changed and appended rows of the store, everything again when rows were renumbered."""
+        if self.store_generation != store.generation or self.dim != store.dim or self.rows > store.rows:
+            self._rebuild(store)
+            return
+        changed = sorted(row for row in set(changed_rows) if row < self.rows)
+        if len(changed) == 0 and self.rows == store.rows:
+            return
+        # codes are patched in place, a crash before the final save forces a rebuild on the next sync
+        self._save(store_generation=-1)
+        row_bytes = self.dim * np.dtype(CODE_DTYPES[self.quantization]).itemsize
+        scales = [self.scales]
+        with open(self.codes_path, "r+b") as f:
+            if len(changed) > 0:
+                codes, changed_scales = quantize(store.matrix[changed], self.quantization)
+                for row, code in zip(changed, codes):
+                    f.seek(row * row_bytes)
+                    f.write(code.tobytes())
+                scales[0] = self.scales.copy()
+                scales[0][changed] = changed_scales
+            f.seek(self.rows * row_bytes)
+            for start in range(self.rows, store.rows, self.block_size):
+                codes, block_scales = quantize(store.matrix[start:min(start + self.block_size, store.rows)], self.quantization)
+                f.write(codes.tobytes())
+                scales.append(block_scales)
+            f.truncate()
+        self.scales = np.concatenate(scales)
+        self._save(store_generation=store.generation)
+        self._open_codes()
+
+    def _rebuild(self, store) -> None:
+        scales = []
+        tmp_path = self.codes_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for start in range(0, store.rows, self.block_size):
+                codes, block_scales = quantize(store.matrix[start:min(start + self.block_size, store.rows)], self.quantization)
+                f.write(codes.tobytes())
+                scales.append(block_scales)
+        os.replace(tmp_path, self.codes_path)
+        self.dim = store.dim
+        self.scales = np.concatenate(scales) if len(scales) > 0 else np.zeros(0, dtype=np.float32)
+        self._save(store_generation=store.generation)
+        self._open_codes()
+
+    def _save(self, store_generation: int) -> None:
+        self.store_generation = store_generation
+        tmp_path = self.meta_path + ".tmp.npz"
+        np.savez(tmp_path, quantization=self.quantization, store_generation=store_generation, dim=self.dim, scales=self.scales)
+        os.replace(tmp_path, self.meta_path)
+
+    def _scores(self, queries, rows=None):
+        count = self.rows if rows is None else len(rows)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, self.block_size):
+            stop = min(start + self.block_size, count)
+            index = slice(start, stop) if rows is None else rows[start:stop]
+            block = np.asarray(self.codes[index], dtype=np.float32)
+            scores[:, start:stop] = (queries @ block.T) * self.scales[index]
+        return scores
+
+    def search_many(self, exact_matrix, query_matrix, k=3, threshold=None, mask=None, rows=None, rerank=4):
+        """
+        Same contract as `cosine_similarity_many`, only `rows` are scored if given and returned indexes are rows
+        of `exact_matrix`. The best `k * rerank` rows by quantized score are re-scored on `exact_matrix`,
+        so returned scores are exact and `threshold` applies to them.
+        """
+        queries = normalize(query_matrix)
+        rows = None if rows is None else np.asarray(rows, dtype=np.int64)
+        results = []
+        for query, coarse in zip(queries, self._scores(queries, rows)):
+            candidates = top_k_indices(coarse, k=k * rerank, mask=mask if rows is None else None)
+            candidates = np.sort(candidates if rows is None else rows[candidates])
+            similarities = np.asarray(exact_matrix[candidates]) @ query
+            top_k = top_k_indices(similarities, k=k, threshold=threshold)
+            results.append((candidates[top_k], similarities[top_k]))
+        return results
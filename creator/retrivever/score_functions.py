@@ -1,7 +1,40 @@
 import numpy as np
 
 
-def cosine_similarity(docs_matrix, query_vec, k=3):
-    similarities = np.dot(docs_matrix, query_vec) / (np.linalg.norm(docs_matrix, axis=1) * np.linalg.norm(query_vec))
-    top_k_indices = np.argsort(similarities)[-k:][::-1]
-    return top_k_indices, similarities[top_k_indices]
+def normalize(vectors):
+    """Scale vectors (one per row) to unit length, zero vectors are left untouched."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def top_k_indices(similarities, k=3, threshold=None, mask=None):
+    """
+    Indices of the k largest similarities, best first, in O(n + k log k).
+    Only entries that reach `threshold` and where `mask` is True are considered.
+    """
+    keep = np.ones(len(similarities), dtype=bool) if mask is None else np.array(mask, dtype=bool)
+    if threshold is not None:
+        keep &= similarities >= threshold
+    candidates = np.flatnonzero(keep)
+    if k < len(candidates):
+        candidates = candidates[np.argpartition(similarities[candidates], -k)[-k:]]
+    return candidates[np.argsort(similarities[candidates])[::-1]]
+
+
+def cosine_similarity(docs_matrix, query_vec, k=3, threshold=None, mask=None):
+    """Top k cosine similarities of a query against `docs_matrix`, whose rows must already be unit-normalized."""
+    similarities = np.dot(docs_matrix, normalize(query_vec))
+    top_k = top_k_indices(similarities, k=k, threshold=threshold, mask=mask)
+    return top_k, similarities[top_k]
+
+
+def cosine_similarity_many(docs_matrix, query_matrix, k=3, threshold=None, mask=None):
+    """`cosine_similarity` for a batch of queries, scored with one matrix-matrix product."""
+    similarities = np.dot(normalize(query_matrix), np.asarray(docs_matrix).T)
+    results = []
+    for query_similarities in similarities:
+        top_k = top_k_indices(query_similarities, k=k, threshold=threshold, mask=mask)
+        results.append((top_k, query_similarities[top_k]))
+    return results
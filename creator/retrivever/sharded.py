@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import heapq
+import itertools
+import os
+
+from creator.llm import create_embedding
+from creator.config.library import config
+
+from .base import BaseVectorStore, SEARCH_MODES, normalize_query, create_embedding_cache, create_query_cache
+from .watcher import IndexWatcher
+
+
+def default_roots() -> dict:
+    """Skill library roots searched by default: the local library, pulled remote skills and the built-in skills."""
+    # normalized, so skill dirs are keyed by the same path in the indexes and the skill catalog
+    return {
+        "local": os.path.abspath(config.local_skill_library_path),
+        "remote": os.path.abspath(config.remote_skill_library_path),
+        "build_in": os.path.abspath(os.path.commonpath(list(config.build_in_skill_config.values()))),
+    }
+
+
+class ShardedVectorStore:
+    """
+    One `BaseVectorStore` shard per skill library root, each with its own index, manifest and refresh,
+    so a large remote mirror never forces the local library to be reindexed.
+
+    The local shard keeps its index in `local_skill_library_vectordb_path`, the other shards in a
+    subdirectory named after them. Queries are embedded once, shards are searched in parallel and their
+    top_k lists are merged with a heap. Roots that do not exist yet get their shard on the next search.
+    """
+
+    def __init__(self, roots: Optional[dict] = None):
+        self.vectordb_path: str = config.local_skill_library_vectordb_path
+        self.roots = roots if roots is not None else default_roots()
+        self.embedding_model = create_embedding(backend=config.embedding_backend)
+        self.embedding_cache = create_embedding_cache()
+        self.query_cache = create_query_cache(self.vectordb_path)
+        self.shards = {}
+        self.watcher = None
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.roots)), thread_name_prefix="vectordb-shard")
+        self._open_shards()
+
+    def _shard_vectordb_path(self, name: str) -> str:
+        if name == "local":
+            return self.vectordb_path
+        return os.path.join(self.vectordb_path, name)
+
+    def _open_shards(self) -> None:
+        for name, root in self.roots.items():
+            if name in self.shards or not os.path.isdir(root):
+                continue
+            self.shards[name] = BaseVectorStore(
+                skill_library_path=root,
+                vectordb_path=self._shard_vectordb_path(name),
+                embedding_model=self.embedding_model,
+                embedding_cache=self.embedding_cache,
+                query_cache=self.query_cache,
+            )
+
+    def start_watcher(self) -> IndexWatcher:
+        """Keep the shards up to date from a background thread, searches then never pay for indexing."""
+        if self.watcher is None:
+            self.watcher = IndexWatcher(self.shards.values(), debounce=config.vectordb_watch_debounce, poll_interval=config.vectordb_watch_poll_interval)
+            self.watcher.start()
+        return self.watcher
+
+    def refresh(self, defer_embedding: bool = False):
+        """Reindex the shards whose library changed, see `BaseVectorStore.refresh`."""
+        self._open_shards()
+        for future in [self.executor.submit(shard.refresh, defer_embedding=defer_embedding) for shard in self.shards.values()]:
+            future.result()
+
+    def embed_queries(self, queries: List[str]) -> list:
+        normalized = [normalize_query(query) for query in queries]
+        return self.query_cache.embed_documents(self.embedding_model, normalized)
+
+    def cache_stats(self) -> dict:
+        return {"query_cache": self.query_cache.stats(), "embedding_cache": self.embedding_cache.stats()}
+
+    def search(self, query: str, top_k: int = 3, threshold=0.8, mode: str = "vector", filters: Optional[dict] = None) -> List[dict]:
+        return self.search_many([query], top_k=top_k, threshold=threshold, mode=mode, filters=filters)[0]
+
+    def search_many(self, queries: List[str], top_k: int = 3, threshold=0.8, mode: str = "vector", filters: Optional[dict] = None) -> List[List[dict]]:
+        """
+        Same contract as `BaseVectorStore.search_many` over every shard.
+        Lexical and hybrid scores are computed per shard, so they rank well within a shard but only roughly across shards.
+        """
+        assert mode in SEARCH_MODES, f"mode should be one of {SEARCH_MODES}, got {mode}"
+        self._open_shards()
+        query_embeddings = None if mode == "lexical" else self.embed_queries(queries)
+        futures = [
+            self.executor.submit(shard.search_many, queries, top_k=top_k, threshold=threshold, mode=mode, filters=filters, query_embeddings=query_embeddings)
+            for shard in self.shards.values()
+        ]
+        shard_results = [future.result() for future in futures]
+        results = []
+        for i in range(len(queries)):
+            # every shard list is already sorted by score, merge them lazily and stop at top_k
+            merged = heapq.merge(*(shard_result[i] for shard_result in shard_results), key=lambda skill: skill["score"], reverse=True)
+            results.append(list(itertools.islice(merged, top_k)))
+        return results
@@ -0,0 +1,201 @@
+import numpy as np
+import json
+import os
+
+from .score_functions import normalize
+
+
+FORMAT_VERSION = 2
+
+
+class EmbeddingStore:
+    """
+    Embedding matrix stored as a raw float32 file and opened with `np.memmap`,
+    skill metadata stored in a compact json sidecar.
+    Rows are unit-normalized when written so cosine similarity is a single matrix-vector product.
+
+    Layout inside `vectordb_path`:
+        - vector_db.json: {"format": 2, "dim": d, "rows": n, "matrix_file": ..., "embedding_model": ..., "skills": {skill_id: metadata}}
+        - vector_db.f32: n * d float32 values, row `i` belongs to the skill whose metadata has `embedding_row == i`.
+          Rows of removed skills stay behind as dead rows until `compact()` rewrites the matrix
+          into a new `vector_db.<generation>.f32` file.
+    """
+
+    def __init__(self, vectordb_path: str, name: str = "vector_db"):
+        self.vectordb_path = vectordb_path
+        self.name = name
+        self.metadata_path = os.path.join(vectordb_path, name + ".json")
+        self.matrix_path = os.path.join(vectordb_path, name + ".f32")
+        self.generation = 0
+        self.embedding_model = ""
+        self.dim = 0
+        self.rows = 0
+        self.skills = {}
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.row_keys = []
+        # identity of the metadata file this store last read or wrote, see `is_current`
+        self.file_version = None
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.metadata_path):
+            return
+        with open(self.metadata_path, mode="r", encoding="utf-8") as f:
+            self.file_version = _file_version(f.fileno())
+            data = json.load(f)
+        if data.get("format") != FORMAT_VERSION:
+            self._migrate_legacy(data)
+            return
+        self.dim = data["dim"]
+        self.rows = data["rows"]
+        self.skills = data["skills"]
+        self.generation = data.get("generation", 0)
+        self.embedding_model = data.get("embedding_model", "")
+        self.matrix_path = os.path.join(self.vectordb_path, data.get("matrix_file", self.name + ".f32"))
+        self._open_matrix()
+        if not data.get("normalized", False):
+            self._rewrite_matrix(sorted(self.skills, key=lambda key: self.skills[key]["embedding_row"]), transform=normalize)
+
+    def _migrate_legacy(self, vector_store: dict):
+        # the legacy vector_db.json kept every embedding as a float list inside the skill json
+        keys = sorted(key for key, value in vector_store.items() if "embedding" in value)
+        embeddings = [vector_store[key].pop("embedding") for key in keys]
+        self.add({key: vector_store[key] for key in keys}, embeddings)
+        self.save()
+
+    def _open_matrix(self):
+        if self.rows == 0 or not os.path.exists(self.matrix_path):
+            self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+        else:
+            self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        self.row_keys = [None] * self.rows
+        for key, value in self.skills.items():
+            self.row_keys[value["embedding_row"]] = key
+        # False for the dead rows of removed skills
+        self.live = np.array([key is not None for key in self.row_keys], dtype=bool)
+
+    def add(self, skills: dict, embeddings) -> None:
+        """Append one row per skill to the matrix file, keys and embeddings must share the same order."""
+        if len(skills) == 0:
+            return
+        embeddings = normalize(embeddings)
+        if self.dim == 0:
+            self.dim = embeddings.shape[1]
+        assert embeddings.shape[1] == self.dim, f"embedding dim {embeddings.shape[1]} does not match store dim {self.dim}"
+
+        mode = "r+b" if os.path.exists(self.matrix_path) else "wb"
+        with open(self.matrix_path, mode) as f:
+            # drop any bytes a crashed writer left behind the last committed row
+            f.seek(self.rows * self.dim * 4)
+            f.write(embeddings.tobytes())
+            f.truncate()
+
+        for i, (key, value) in enumerate(skills.items()):
+            value["embedding_row"] = self.rows + i
+            self.skills[key] = value
+        self.rows += len(skills)
+        self._open_matrix()
+
+    def upsert(self, skills: dict, embeddings) -> None:
+        """Overwrite the rows of skills already in the store in place, append the others."""
+        embeddings = normalize(embeddings)
+        keys = list(skills)
+        existing = [i for i, key in enumerate(keys) if key in self.skills]
+        new = [i for i, key in enumerate(keys) if key not in self.skills]
+        if len(existing) > 0:
+            with open(self.matrix_path, "r+b") as f:
+                for i in existing:
+                    f.seek(self.skills[keys[i]]["embedding_row"] * self.dim * 4)
+                    f.write(embeddings[i].tobytes())
+            for i in existing:
+                skills[keys[i]]["embedding_row"] = self.skills[keys[i]]["embedding_row"]
+                self.skills[keys[i]] = skills[keys[i]]
+        if len(new) > 0:
+            self.add({keys[i]: skills[keys[i]] for i in new}, embeddings[new])
+        else:
+            self._open_matrix()
+
+    def replace_metadata(self, skills: dict) -> None:
+        """Replace the metadata of skills already in the store, keeping their rows."""
+        for key, value in skills.items():
+            value["embedding_row"] = self.skills[key]["embedding_row"]
+            self.skills[key] = value
+
+    def remove(self, keys) -> None:
+        """Drop skills from the metadata, their rows stay in the matrix file as dead rows."""
+        for key in keys:
+            self.skills.pop(key, None)
+        self._open_matrix()
+
+    @property
+    def dead_rows(self) -> int:
+        return self.rows - len(self.skills)
+
+    def compact(self) -> None:
+        """Rewrite the matrix without dead rows."""
+        if self.dead_rows == 0:
+            return
+        self._rewrite_matrix(sorted(self.skills, key=lambda key: self.skills[key]["embedding_row"]))
+
+    def _rewrite_matrix(self, keys, transform=None) -> None:
+        """Write the rows of `keys` into a new matrix file, then swap the metadata over to it."""
+        matrix = np.ascontiguousarray(self.matrix[[self.skills[key]["embedding_row"] for key in keys]])
+        if transform is not None:
+            matrix = transform(matrix)
+        old_matrix_path = self.matrix_path
+        self.generation += 1
+        self.matrix_path = os.path.join(self.vectordb_path, f"{self.name}.{self.generation}.f32")
+        with open(self.matrix_path, "wb") as f:
+            f.write(matrix.tobytes())
+        for row, key in enumerate(keys):
+            self.skills[key]["embedding_row"] = row
+        self.rows = len(keys)
+        # readers keep the old file until they reload, it is only unlinked once the new metadata is in place
+        self.save()
+        self._open_matrix()
+        if os.path.exists(old_matrix_path):
+            os.remove(old_matrix_path)
+
+    def reset(self) -> None:
+        """Drop every skill and row, e.g. when the embedding model changed and every vector must be rebuilt."""
+        old_matrix_path = self.matrix_path
+        # cleared in place, callers may hold a reference to the skills dict
+        self.skills.clear()
+        self.dim = 0
+        self.rows = 0
+        self.generation += 1
+        self.matrix_path = os.path.join(self.vectordb_path, f"{self.name}.{self.generation}.f32")
+        self.save()
+        self._open_matrix()
+        if os.path.exists(old_matrix_path):
+            os.remove(old_matrix_path)
+
+    def save(self) -> None:
+        data = {
+            "format": FORMAT_VERSION,
+            "dim": self.dim,
+            "rows": self.rows,
+            "generation": self.generation,
+            "matrix_file": os.path.basename(self.matrix_path),
+            "normalized": True,
+            "embedding_model": self.embedding_model,
+            "skills": self.skills,
+        }
+        tmp_path = self.metadata_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.metadata_path)
+        self.file_version = _file_version(self.metadata_path)
+
+    def is_current(self) -> bool:
+        """False once another process replaced the metadata file this store read or wrote last."""
+        try:
+            return _file_version(self.metadata_path) == self.file_version
+        except FileNotFoundError:
+            return self.file_version is None
+
+
+def _file_version(file):
+    # every save replaces the file, so its inode changes even when the mtime resolution is coarse
+    stat = os.stat(file)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
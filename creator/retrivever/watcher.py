@@ -0,0 +1,143 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+from loguru import logger
+
+
+class Inotify:
+    """Minimal inotify binding over libc, raises OSError where inotify is not available."""
+
+    # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    mask = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200 | 0x400
+    IN_ISDIR = 0x40000000
+    IN_CREATE = 0x100
+    IN_MOVED_TO = 0x80
+    event_header = struct.Struct("iIII")
+
+    def __init__(self):
+        library = ctypes.util.find_library("c")
+        if library is None:
+            raise OSError("libc not found")
+        self.libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is not supported on this platform")
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+
+    def add_watch(self, path: str) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self.watches[wd] = path
+
+    def read(self, timeout: float) -> list:
+        """Wait up to `timeout` seconds, return the (directory, mask, name) of the events received."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if len(ready) == 0:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.event_header.unpack_from(data, offset)
+            offset += self.event_header.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if wd in self.watches:
+                events.append((self.watches[wd], mask, name))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class IndexWatcher(threading.Thread):
+    """
+    Daemon thread keeping vector stores up to date off the request path.
+
+    Changes under the skill library of every store are watched with inotify where available,
+    otherwise the store manifests are polled every `poll_interval` seconds. Once no change came in
+    for `debounce` seconds, each touched store is updated in one batch: skills are embedded while
+    searches keep using the current index, which is then swapped under the store lock.
+    Watched stores stop refreshing themselves on search.
+    """
+
+    def __init__(self, stores, debounce: float = 1.0, poll_interval: float = 5.0):
+        super().__init__(name="vectordb-watcher", daemon=True)
+        self.stores = list(stores)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.stopped = threading.Event()
+        for store in self.stores:
+            store.auto_refresh = False
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def run(self):
+        try:
+            inotify = Inotify()
+            for store in self.stores:
+                self._watch_tree(inotify, store.skill_library_path)
+        except OSError as e:
+            logger.warning(f"Falling back to polling the skill libraries every {self.poll_interval}s: {e}")
+            self._poll()
+            return
+        try:
+            self._watch(inotify)
+        finally:
+            inotify.close()
+
+    def _watch_tree(self, inotify: Inotify, root: str) -> None:
+        for path, _, _ in os.walk(root):
+            inotify.add_watch(path)
+
+    def _store_of(self, path: str):
+        for store in self.stores:
+            root = os.path.abspath(store.skill_library_path)
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                return store
+        return None
+
+    def _watch(self, inotify: Inotify) -> None:
+        while not self.stopped.is_set():
+            events = inotify.read(self.poll_interval)
+            touched = []
+            # debounce: keep collecting until the libraries stay quiet for `debounce` seconds
+            while len(events) > 0:
+                for directory, mask, name in events:
+                    if mask & Inotify.IN_ISDIR and mask & (Inotify.IN_CREATE | Inotify.IN_MOVED_TO):
+                        try:
+                            self._watch_tree(inotify, os.path.join(directory, name))
+                        except OSError as e:
+                            # the directory is gone again, or the watch limit was reached
+                            logger.warning(f"Failed to watch {os.path.join(directory, name)}: {e}")
+                    store = self._store_of(os.path.abspath(directory))
+                    if store is not None and store not in touched:
+                        touched.append(store)
+                events = inotify.read(self.debounce)
+            for store in touched:
+                self._update(store)
+
+    def _poll(self) -> None:
+        while not self.stopped.wait(self.poll_interval):
+            for store in self.stores:
+                if store.manifest.is_stale(store.skill_library_path):
+                    # let a skill being saved finish before reading it
+                    self.stopped.wait(self.debounce)
+                    self._update(store)
+
+    def _update(self, store) -> None:
+        try:
+            store.update_index()
+        except Exception as e:
+            logger.warning(f"Failed to update the index of {store.skill_library_path}: {e}")
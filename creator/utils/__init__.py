@@ -11,6 +11,8 @@ from .printer import print
 from .code_split import split_code_blocks
 from .valid_code import is_valid_code, is_expression
 from .tips_utils import remove_tips
+from .skill_pack import PACK_FILE, SkillPack, write_skill_pack, explode_skill_pack
+from .content_hash import skill_content_hash
 
 
 __all__ = [
@@ -27,5 +29,10 @@ __all__ = [
     "split_code_blocks",
     "is_valid_code",
     "is_expression",
-    "remove_tips"
+    "remove_tips",
+    "PACK_FILE",
+    "SkillPack",
+    "write_skill_pack",
+    "explode_skill_pack",
+    "skill_content_hash"
 ]
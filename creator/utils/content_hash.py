@@ -0,0 +1,19 @@
+import hashlib
+import json
+
+
+# the code and schema of a skill, two skills with the same values are the same skill whatever their metadata
+CONTENT_FIELDS = (
+    "skill_name", "skill_description", "skill_tags", "skill_program_language", "skill_code",
+    "skill_parameters", "skill_return", "skill_dependencies", "skill_usage_example",
+)
+
+
+def skill_content(skill_json: dict) -> dict:
+    return {field: skill_json.get(field) for field in CONTENT_FIELDS}
+
+
+def skill_content_hash(skill_json: dict) -> str:
+    """Hash of the code and schema of a skill json, its metadata, conversation history and test summary are left out."""
+    content = json.dumps(skill_content(skill_json), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
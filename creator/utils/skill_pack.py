@@ -0,0 +1,143 @@
+import gzip
+import json
+import os
+import struct
+
+
+PACK_FILE = "skill.pack"
+MAGIC = b"SKPK"
+FORMAT_VERSION = 1
+# magic, format version, header length
+PREFIX = struct.Struct("<4sHI")
+# size of the first read of a pack, the header and the small entries stored up front come with it
+READ_AHEAD = 64 * 1024
+# skill fields kept out of the packed skill.json, each one is stored in its own entry and read only when needed
+OUT_OF_LINE_FIELDS = ("skill_code", "conversation_history", "test_summary")
+# the conversation history is never kept in skill.json, it is stored once in this gzip compressed file (or pack entry)
+HISTORY_FILE = "conversation_history.json.gz"
+
+
+def dump_conversation_history(conversation_history: list) -> bytes:
+    # mtime=0 keeps the bytes of an unchanged history identical between saves
+    return gzip.compress(json.dumps(conversation_history, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), compresslevel=6, mtime=0)
+
+
+def load_conversation_history(data: bytes) -> list:
+    return json.loads(gzip.decompress(data))
+
+
+class SkillPack:
+    """
+    A skill saved as one `skill.pack` file instead of the legacy layout of one file per part.
+
+    A json header maps the name of every legacy file (skill.json, skill_code.py, embedding_text.txt, ...)
+    to the offset and length of its bytes in the payload that follows. Entries are stored from the smallest
+    to the largest, so the skill json and the embedding text usually come with the header in a single read,
+    while code and conversation history are only read when asked for.
+    The packed skill.json has no `OUT_OF_LINE_FIELDS`, `skill_json()` puts them back.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = f.read(READ_AHEAD)
+            if len(self.buffer) < PREFIX.size:
+                raise ValueError(f"{path} is not a skill pack")
+            magic, version, header_length = PREFIX.unpack_from(self.buffer)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a skill pack")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path} is a skill pack of format {version}, only format {FORMAT_VERSION} is supported")
+            self.data_offset = PREFIX.size + header_length
+            if len(self.buffer) < self.data_offset:
+                self.buffer += f.read(self.data_offset - len(self.buffer))
+        self.entries = json.loads(self.buffer[PREFIX.size:self.data_offset])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def names(self) -> list:
+        return list(self.entries)
+
+    def read(self, name: str) -> bytes:
+        offset, length = self.entries[name]
+        start = self.data_offset + offset
+        if start + length <= len(self.buffer):
+            return self.buffer[start:start + length]
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return f.read(length)
+
+    def read_text(self, name: str) -> str:
+        return self.read(name).decode("utf-8")
+
+    def read_json(self, name: str):
+        return json.loads(self.read(name))
+
+    def read_field(self, field: str):
+        """Read one of `OUT_OF_LINE_FIELDS`, missing entries give the default value of the field."""
+        assert field in OUT_OF_LINE_FIELDS, f"field should be one of {OUT_OF_LINE_FIELDS}, got {field}"
+        if field == "skill_code":
+            name = next((name for name in self.entries if name.startswith("skill_code")), None)
+            return self.read_text(name) if name is not None else ""
+        if field == "conversation_history" and HISTORY_FILE in self.entries:
+            return load_conversation_history(self.read(HISTORY_FILE))
+        if field + ".json" not in self.entries:
+            return [] if field == "conversation_history" else None
+        return self.read_json(field + ".json")
+
+    def skill_json(self, fields=OUT_OF_LINE_FIELDS) -> dict:
+        """The skill json, with the out of line `fields` read back in."""
+        skill_json = self.read_json("skill.json")
+        for field in fields:
+            skill_json[field] = self.read_field(field)
+        return skill_json
+
+    def explode(self, skill_dir: str) -> None:
+        """Write the pack back into the legacy layout of one file per entry in `skill_dir`."""
+        os.makedirs(skill_dir, exist_ok=True)
+        for name in self.entries:
+            if name == HISTORY_FILE:
+                with open(os.path.join(skill_dir, name), mode="wb") as f:
+                    f.write(self.read(name))
+                continue
+            if name == "skill.json":
+                # the legacy layout keeps everything but the conversation history in skill.json
+                skill_json = self.skill_json(fields=[field for field in OUT_OF_LINE_FIELDS if field != "conversation_history"])
+                content = json.dumps(skill_json, ensure_ascii=False, indent=4)
+            elif name.endswith(".json"):
+                content = json.dumps(self.read_json(name), ensure_ascii=False, indent=4)
+            else:
+                content = self.read_text(name)
+            with open(os.path.join(skill_dir, name), mode="w", encoding="utf-8") as f:
+                f.write(content)
+
+
+def write_skill_pack(path: str, files: dict) -> None:
+    """Pack `files` (legacy file name -> text or bytes) into `path`, through a temporary file so readers never see half a pack."""
+    blobs = [(name, content if isinstance(content, bytes) else content.encode("utf-8")) for name, content in files.items()]
+    blobs.sort(key=lambda item: len(item[1]))
+    entries = {}
+    offset = 0
+    for name, blob in blobs:
+        entries[name] = [offset, len(blob)]
+        offset += len(blob)
+    header = json.dumps(entries, ensure_ascii=False).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for _, blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+
+def explode_skill_pack(skill_dir: str, target_dir: str = "", remove_pack: bool = False) -> None:
+    """
+    Convert the packed skill of `skill_dir` to the legacy layout, into `target_dir` (`skill_dir` by default).
+    With `remove_pack` the pack is deleted afterwards, so the legacy files are what gets loaded and indexed.
+    """
+    pack_path = os.path.join(skill_dir, PACK_FILE)
+    SkillPack(pack_path).explode(target_dir or skill_dir)
+    if remove_pack:
+        os.remove(pack_path)